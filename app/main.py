@@ -1,7 +1,10 @@
 import streamlit as st
 import os
 import sys
+import time
+import uuid
 import warnings
+import numpy as np
 
 # Comprehensive torch watcher prevention - must be set before any imports
 os.environ.update({
@@ -20,28 +23,15 @@ warnings.filterwarnings("ignore")
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-# Monkey patch torch to disable watchers if imported
+# Import utilities with error handling; these are light, torch is only loaded by TextVectorizer()
 try:
-    import torch
-    if hasattr(torch, 'jit') and hasattr(torch.jit, '_set_jit_logging'):
-        torch.jit._set_jit_logging(False)
-except ImportError:
-    pass
-    os.environ.update({
-        "TOKENIZERS_PARALLELISM": "false",
-        "STREAMLIT_WATCHER_IGNORE_MODULES": "torch,torch.classes,torch.jit,torch.nn,torch.utils",
-        "STREAMLIT_SERVER_RUN_ON_SAVE": "false",
-        "TORCH_DISABLE_WATCHDOG": "1",
-        "TORCH_JIT_DISABLE_WATCHDOG": "1",
-        "PYTHONUNBUFFERED": "1"
-    })
-    import warnings
-    warnings.filterwarnings("ignore")
-
-# Import utilities with error handling
-try:
-    from utils.vectorizer import TextVectorizer
-    from utils.rag_llm import RAGLLM
+    from utils.vectorizer import TextVectorizer, vectorizer_options
+    from utils.rag_llm import OPENROUTER_API_URL, RAGLLM
+    from utils.llm_gateway import GatewayBusyError, LLMGateway
+    from utils.response_cache import CACHE_BACKENDS, ResponseCache, store_version
+    from utils.semantic_cache import SemanticCache
+    from utils.vector_store import read_manifest
+    from app.warmup import ChatbotWarmup
 except ImportError as e:
     st.error(f"Failed to import required modules: {e}")
     st.error("Please ensure all dependencies are installed correctly.")
@@ -171,56 +161,153 @@ header {visibility: hidden;}
 }
 </style>
 """, unsafe_allow_html=True)
+
+def build_chatbot(api_key: str, retrieval_config: dict, llm_config: dict, progress=lambda status: None):
+    """Build the chatbot components and warm them up; runs in the background warm-up thread."""
+    progress("Loading AI models")
+    vectorizer = TextVectorizer(**vectorizer_options(retrieval_config))
+
+    # Check if we have the website data
+    website_data_path = os.path.join("data", "website_data.txt")
+    if not os.path.exists(website_data_path):
+        raise FileNotFoundError("website_data.txt not found in data directory!")
+
+    # Load the prebuilt vector store, re-embedding only if the content changed
+    progress("Loading knowledge base")
+    vector_store_path = os.path.join("data", "vector_store")
+    index, chunks, embeddings = vectorizer.load_or_build_vector_store(website_data_path, vector_store_path)
+
+    # Dummy encode and search so the first real query finds the encoder and index pages already warm
+    progress("Warming up")
+    warm_vector = vectorizer.model.encode(["What does Jiva Infotech do?"])
+    if len(chunks):
+        index.kneighbors(np.asarray(warm_vector, dtype=np.float32), n_neighbors=1)
+
+    # [openrouter] api_url can point at any compatible endpoint, e.g. benchmarks/sse_stub_server.py
+    rag_llm = RAGLLM(
+        api_key,
+        api_url=llm_config.get("api_url", OPENROUTER_API_URL),
+        pool_size=int(llm_config.get("pool_size", 10)),
+        connect_timeout=float(llm_config.get("connect_timeout", 5.0)),
+        read_timeout=float(llm_config.get("read_timeout", 30.0)),
+        keep_alive=bool(llm_config.get("keep_alive", True)),
+        retries=int(llm_config.get("max_retries", 3)),
+        deadline=float(llm_config.get("deadline", 45.0)),
+        failure_threshold=int(llm_config.get("breaker_failure_threshold", 5)),
+        recovery_timeout=float(llm_config.get("breaker_recovery_timeout", 30.0)),
+        models=list(llm_config.get("models", [])) or None,
+        hedge=bool(llm_config.get("hedge", True)),
+        hedge_delay=float(llm_config["hedge_delay"]) if "hedge_delay" in llm_config else None
+    )
+    # Repeated questions with the same retrieved context are answered from the cache;
+    # stamping it with the store version drops answers cached before the store was rebuilt
+    cache = None
+    cache_config = dict(llm_config.get("cache", {}))
+    if cache_config.get("enabled", True):
+        backend_name = cache_config.get("backend", "memory")
+        if backend_name not in CACHE_BACKENDS:
+            raise ValueError(f"Unknown response cache backend {backend_name!r}; expected one of {sorted(CACHE_BACKENDS)}")
+        backend_args = {"path": cache_config.get("path", os.path.join("data", "response_cache.sqlite"))} \
+            if backend_name == "sqlite" else {}
+        cache = ResponseCache(
+            CACHE_BACKENDS[backend_name](max_entries=int(cache_config.get("max_entries", 1000)), **backend_args),
+            ttl=float(cache_config.get("ttl", 3600))
+        )
+        cache.set_store_version(store_version(read_manifest(vector_store_path)))
+
+    # Paraphrases of an answered question reuse its answer when they retrieve the same chunks;
+    # off unless configured, since the threshold should be tuned on real queries first
+    semantic_cache = None
+    semantic_config = dict(llm_config.get("semantic_cache", {}))
+    if semantic_config.get("enabled", False):
+        semantic_cache = SemanticCache(
+            vectorizer.encode_queries,
+            threshold=float(semantic_config.get("threshold", 0.9)),
+            max_entries=int(semantic_config.get("max_entries", 1000)),
+            ttl=float(semantic_config.get("ttl", 3600)),
+            log_path=semantic_config.get("log_path")
+        )
+
+    # Shared by every session: caps concurrent and per-minute upstream calls, serves sessions in turn
+    gateway_config = dict(llm_config.get("gateway", {}))
+    gateway = LLMGateway(
+        rag_llm,
+        workers=int(gateway_config.get("workers", 4)),
+        requests_per_minute=float(gateway_config.get("requests_per_minute", 60)),
+        burst=int(gateway_config.get("burst", 10)),
+        max_wait=float(gateway_config.get("max_wait", 15.0)),
+        max_queue=int(gateway_config.get("max_queue", 64)),
+        coalesce=bool(gateway_config.get("coalesce", True)),
+        cache=cache,
+        semantic_cache=semantic_cache
+    )
+
+    return vectorizer, index, chunks, gateway
+
+
+def get_api_key():
+    """Return the OpenRouter API key from Streamlit secrets, or None if it is not configured."""
+    try:
+        api_key = st.secrets["openrouter"]["api_key"]
+    except KeyError:
+        return None
+    if not api_key or api_key.strip() == "":
+        return None
+    return api_key
+
+
 @st.cache_resource(show_spinner=False)
+def start_warmup(api_key: str) -> ChatbotWarmup:
+    """Start building the chatbot in the background, once per server process."""
+    # Optional retrieval tuning from secrets, e.g. [retrieval] index_type = "ivf"
+    retrieval_config = dict(st.secrets.get("retrieval", {}))
+    llm_config = dict(st.secrets.get("openrouter", {}))
+    return ChatbotWarmup(lambda progress: build_chatbot(api_key, retrieval_config, llm_config, progress)).start()
+
+
 def load_chatbot():
-    """Load the chatbot components with caching."""
+    """Return the chatbot components, waiting for the background warm-up if it is still running."""
+    api_key = get_api_key()
+    if api_key is None:
+        st.error("🔑 **API Key Not Found!**")
+        st.error("Please configure your OpenRouter API key in Streamlit Cloud secrets:")
+        st.code("""
+        [openrouter]
+        api_key = "your_actual_api_key_here"
+        """)
+        st.info("📋 **How to add secrets in Streamlit Cloud:**\n"
+               "1. Go to your app dashboard\n"
+               "2. Click ⚙️ Settings\n"
+               "3. Go to Secrets tab\n"
+               "4. Add the above configuration")
+        st.stop()
+
+    warmup = start_warmup(api_key)
+    if not warmup.ready.is_set():
+        with st.spinner(f"🚀 JivaBot is still warming up ({warmup.status.lower()})... your question will be answered as soon as it is ready. ⏳"):
+            warmup.ready.wait()
     try:
-        # Initialize vectorizer with error handling
-        with st.spinner("Loading AI models..."):
-            vectorizer = TextVectorizer()
-        
-        # Check if we have the website data
-        website_data_path = os.path.join("data", "website_data.txt")
-        if not os.path.exists(website_data_path):
-            st.error("Error: website_data.txt not found in data directory!")
-            st.stop()
-            
-        # Read the website data
-        with open(website_data_path, 'r', encoding='utf-8') as f:
-            text = f.read()
-            
-        # Create chunks and embeddings with progress indicator
-        with st.spinner("Processing content..."):
-            chunks = vectorizer.get_text_chunks(text)
-            index, embeddings = vectorizer.create_vector_store(chunks)
-        
-        # Get API key from Streamlit secrets
-        try:
-            api_key = st.secrets["openrouter"]["api_key"]
-            if not api_key or api_key.strip() == "":
-                raise KeyError("API key is empty")
-        except KeyError:
-            st.error("🔑 **API Key Not Found!**")
-            st.error("Please configure your OpenRouter API key in Streamlit Cloud secrets:")
-            st.code("""
-            [openrouter]
-            api_key = "your_actual_api_key_here"
-            """)
-            st.info("📋 **How to add secrets in Streamlit Cloud:**\n"
-                   "1. Go to your app dashboard\n"
-                   "2. Click ⚙️ Settings\n"
-                   "3. Go to Secrets tab\n"
-                   "4. Add the above configuration")
-            st.stop()
-        
-        rag_llm = RAGLLM(api_key)
-        
-        return vectorizer, index, chunks, rag_llm
-        
+        return warmup.wait()
     except Exception as e:
+        start_warmup.clear()  # don't keep serving the failed warm-up; the next run starts a fresh one
         st.error(f"Error initializing chatbot: {str(e)}")
         st.stop()
 
+
+def bot_message_html(content: str) -> str:
+    """Chat bubble for a bot message, shared by finished and still-streaming answers."""
+    return f"""
+                <div style="display: flex; justify-content: flex-start; margin: 20px 0; align-items: flex-end;">
+                    <div style="width: 35px; height: 35px; background: linear-gradient(135deg, #2c3e50, #4a6741); border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; font-size: 0.9rem; box-shadow: 0 3px 10px rgba(44, 62, 80, 0.3); margin-right: 10px;">
+                        🤖
+                    </div>
+                    <div style="background: linear-gradient(135deg, #2c3e50 0%, #4a6741 100%); color: white; padding: 16px 22px; border-radius: 25px 25px 25px 8px; max-width: 75%; box-shadow: 0 6px 20px rgba(44, 62, 80, 0.4); animation: slideInLeft 0.4s ease-out; font-size: 0.95rem; line-height: 1.5; word-wrap: break-word; position: relative;">
+                        {content}
+                        <div style="position: absolute; bottom: -6px; left: 15px; width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-top: 8px solid #4a6741;"></div>
+                    </div>
+                </div>
+                """
+
 def initialize_session_state():
     """Initialize session state variables."""
     if "messages" not in st.session_state:
@@ -231,6 +318,8 @@ def initialize_session_state():
         st.session_state.user_input = ""
     if "last_context" not in st.session_state:
         st.session_state.last_context = None
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex  # fair-queuing key in the LLM gateway
 
 def main():
     """Main function to run the Streamlit app."""
@@ -239,6 +328,10 @@ def main():
 
     initialize_session_state()
 
+    # Start loading models and the knowledge base in the background while the page renders
+    api_key = get_api_key()
+    warmup = start_warmup(api_key) if api_key else None
+
     # Sidebar
     with st.sidebar:
         st.markdown("### ⚙️ Settings")
@@ -247,6 +340,27 @@ def main():
             value=st.session_state.show_context
         )
         
+        st.markdown("---")
+        st.markdown("### 🔥 Model Status")
+        if warmup is None:
+            st.warning("Waiting for the OpenRouter API key")
+        elif not warmup.ready.is_set():
+            st.info(f"Warming up: {warmup.status} ({warmup.elapsed:.0f}s)")
+        elif warmup.error is not None:
+            st.error(f"Warm-up failed: {warmup.error}")
+            start_warmup.clear()  # retried on the next run instead of cached for the process lifetime
+        else:
+            st.success(f"Ready (warmed up in {warmup.elapsed:.1f}s)")
+            llm_metrics = warmup.result[3].metrics()
+            for model, breaker in llm_metrics["circuit_breakers"].items():
+                if breaker["state"] != "closed":
+                    st.warning(f"{model} circuit breaker {breaker['state'].replace('_', '-')} "
+                               f"after {breaker['consecutive_failures']} consecutive failures")
+            gateway = llm_metrics["gateway"]
+            if gateway["queue_depth"]:
+                st.caption(f"{gateway['queue_depth']} questions queued, "
+                           f"about {gateway['estimated_wait']:.0f}s wait")
+        
         st.markdown("---")
         st.markdown("### 🤖 About JivaBot")
         
@@ -321,17 +435,7 @@ def main():
                 """, unsafe_allow_html=True)
             else:
                 # Bot message - aligned left with avatar (Dark professional theme)
-                st.markdown(f"""
-                <div style="display: flex; justify-content: flex-start; margin: 20px 0; align-items: flex-end;">
-                    <div style="width: 35px; height: 35px; background: linear-gradient(135deg, #2c3e50, #4a6741); border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; font-size: 0.9rem; box-shadow: 0 3px 10px rgba(44, 62, 80, 0.3); margin-right: 10px;">
-                        🤖
-                    </div>
-                    <div style="background: linear-gradient(135deg, #2c3e50 0%, #4a6741 100%); color: white; padding: 16px 22px; border-radius: 25px 25px 25px 8px; max-width: 75%; box-shadow: 0 6px 20px rgba(44, 62, 80, 0.4); animation: slideInLeft 0.4s ease-out; font-size: 0.95rem; line-height: 1.5; word-wrap: break-word; position: relative;">
-                        {message["content"]}
-                        <div style="position: absolute; bottom: -6px; left: 15px; width: 0; height: 0; border-left: 8px solid transparent; border-right: 8px solid transparent; border-top: 8px solid #4a6741;"></div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(bot_message_html(message["content"]), unsafe_allow_html=True)
 
     # Display retrieved context if enabled and available
     if st.session_state.show_context and st.session_state.last_context:
@@ -363,41 +467,37 @@ def main():
         
         # Generate response
         try:
-            # Check if this is the first message (excluding welcome)
-            user_message_count = len([m for m in st.session_state.messages if m["role"] == "user"])
-            is_first_message = user_message_count == 1
-            
-            if is_first_message:
-                # Special loading message for first query
-                with st.spinner("🚀 Setting up JivaBot... Loading AI models, processing knowledge base, and preparing everything for you. This may take a moment for the first query. Please be patient! ⏳"):
-                    vectorizer, index, chunks, rag_llm = load_chatbot()
-                    results = vectorizer.search(user_input, index, chunks)
-                    context_chunks = [chunk for chunk, _ in results]
-                    response = rag_llm.generate_response(user_input, context_chunks)
-                    
-                # Store context for display if enabled
-                if st.session_state.show_context:
-                    st.session_state.last_context = results
-                else:
-                    st.session_state.last_context = None
-                    
-                st.session_state.messages.append({"role": "assistant", "content": response})
+            # Waits only if the background warm-up has not finished yet
+            vectorizer, index, chunks, gateway = load_chatbot()
+            # Render the answer as it streams in, so the spinner only lasts until the first token
+            with chat_container:
+                placeholder = st.empty()
+            with st.spinner("💭 Thinking..."):
+                results = vectorizer.search(user_input, index, chunks)
+                context_chunks = [chunk for chunk, _ in results]
+                stream = gateway.generate_response_stream(user_input, context_chunks,
+                                                          session_id=st.session_state.session_id)
+                response = next(stream, "")
+            last_render = 0.0
+
+            for piece in stream:
+                response += piece
+                if time.perf_counter() - last_render > 0.05:
+                    placeholder.markdown(bot_message_html(response + "▌"), unsafe_allow_html=True)
+                    last_render = time.perf_counter()
+            placeholder.markdown(bot_message_html(response), unsafe_allow_html=True)
+                
+            # Store context for display if enabled
+            if st.session_state.show_context:
+                st.session_state.last_context = results
             else:
-                # Regular loading message for subsequent queries
-                with st.spinner("💭 Thinking..."):
-                    vectorizer, index, chunks, rag_llm = load_chatbot()
-                    results = vectorizer.search(user_input, index, chunks)
-                    context_chunks = [chunk for chunk, _ in results]
-                    response = rag_llm.generate_response(user_input, context_chunks)
-                    
-                # Store context for display if enabled
-                if st.session_state.show_context:
-                    st.session_state.last_context = results
-                else:
-                    st.session_state.last_context = None
-                    
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                st.session_state.last_context = None
+                
+            st.session_state.messages.append({"role": "assistant", "content": response})
                 
+        except GatewayBusyError as e:
+            # Shed before anything was sent upstream; answer with the busy notice instead of an error
+            st.session_state.messages.append({"role": "assistant", "content": f"⏳ {e}"})
         except Exception as e:
             error_msg = str(e)
             if "payment required" in error_msg.lower() or "402" in error_msg:
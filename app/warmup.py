@@ -0,0 +1,60 @@
+"""
+Background warm-up of the chatbot's heavy resources.
+
+The encoder, vector store and LLM client are built in a daemon thread as soon
+as the server renders its first page, followed by a dummy encode and search so
+the first real question does not pay for lazy initialisation either. Queries
+that arrive earlier wait on the `ready` event.
+"""
+
+import time
+import threading
+from typing import Any, Callable, Optional
+
+
+class ChatbotWarmup:
+    """Runs build(progress) once in a background thread and exposes its status and result."""
+
+    def __init__(self, build: Callable[[Callable[[str], None]], Any]):
+        self._build = build
+        self._thread = threading.Thread(target=self._run, name="chatbot-warmup", daemon=True)
+        self.ready = threading.Event()  # set once warm-up has finished, successfully or not
+        self.status = "Waiting to start"
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self) -> "ChatbotWarmup":
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def _progress(self, status: str):
+        self.status = status
+
+    def _run(self):
+        try:
+            self.result = self._build(self._progress)
+            self.status = "Ready"
+        except BaseException as e:  # surfaced to whichever query waits on the result
+            self.error = e
+            self.status = "Failed"
+        finally:
+            self.finished_at = time.time()
+            self.ready.set()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds spent warming up so far, or in total once finished."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until warm-up finishes and return its result, re-raising any warm-up error."""
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"Chatbot warm-up still running after {timeout} seconds ({self.status})")
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -0,0 +1,87 @@
+"""
+Recall@k vs latency report for IVFIndex against exact search.
+
+By default runs on synthetic clustered embeddings; pass --store to use a real
+vector store directory built by utils/vectorizer.py.
+
+Usage:
+    python benchmarks/bench_ann_recall.py --sizes 100000 1000000 --nprobe 1 4 8 16 32
+    python benchmarks/bench_ann_recall.py --store data/vector_store
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ann_index import IVFIndex
+from utils.search_index import ExactSearchIndex, normalize_rows
+from utils.vector_store import load_store
+
+
+def clustered_embeddings(n: int, dim: int, n_topics: int, seed: int) -> np.ndarray:
+    """Unit vectors scattered around random topic centres, closer to real text embeddings than pure noise."""
+    rng = np.random.default_rng(seed)
+    topics = normalize_rows(rng.standard_normal((n_topics, dim), dtype=np.float32))
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        size = min(100_000, n - start)
+        noise = rng.standard_normal((size, dim), dtype=np.float32) * 0.08
+        out[start:start + size] = normalize_rows(topics[rng.integers(0, n_topics, size)] + noise)
+    return out
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    """Query one at a time and return (ms/query, indices)."""
+    start = time.perf_counter()
+    results = [index.kneighbors(q.reshape(1, -1), n_neighbors=k)[1][0] for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), np.array(results)
+
+
+def report(embeddings: np.ndarray, queries: np.ndarray, k: int, nlist, nprobes):
+    exact_ms, truth = timed_search(ExactSearchIndex(embeddings, normalized=True), queries, k)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(embeddings, normalized=True, nlist=nlist)
+    build_s = time.perf_counter() - start
+
+    print(f"\n{len(embeddings)} chunks, nlist={ivf.nlist}, build {build_s:.1f}s, exact {exact_ms:.2f} ms/q")
+    print(f"{'nprobe':>8} {'recall@' + str(k):>10} {'ms/q':>8} {'speedup':>9}")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        ms, found = timed_search(ivf, queries, k)
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(truth, found)])
+        print(f"{nprobe:>8} {recall:>10.3f} {ms:>8.2f} {exact_ms / ms:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--store", help="vector store directory to benchmark instead of synthetic data")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.store:
+        _, embeddings, _ = load_store(args.store)
+        rng = np.random.default_rng(0)
+        # Perturbed stored vectors stand in for queries that land near real content
+        picks = np.asarray(embeddings[rng.choice(len(embeddings), args.queries)])
+        queries = normalize_rows(picks + rng.standard_normal(picks.shape, dtype=np.float32) * 0.05)
+        report(embeddings, queries, args.k, args.nlist, args.nprobe)
+        return
+
+    for n in args.sizes:
+        data = clustered_embeddings(n + args.queries, args.dim, n_topics=max(10, n // 1000), seed=n)
+        report(data[:n], data[n:], args.k, args.nlist, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Encode latency per encoder backend (see utils/encoder_backends.py).
+
+Reports model load time, single-query latency (what a chat question pays) and
+batched throughput (what ingestion pays) for each backend. Texts come from
+data/website_data.txt when it exists, otherwise from a small built-in sample.
+
+Usage:
+    python benchmarks/bench_encoders.py
+    python benchmarks/bench_encoders.py --backends torch torch-int8 onnx --threads 4
+"""
+
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chunking import iter_chunks
+from utils.encoder_backends import ENCODER_BACKENDS, load_encoder
+
+SAMPLE_TEXTS = [
+    "What services does Jiva Infotech offer?",
+    "How do I contact the support team?",
+    "Jiva Infotech builds custom web and mobile applications for small and medium businesses.",
+    "Our cloud migration service moves on-premise workloads to AWS, Azure or Google Cloud with minimal downtime.",
+    "Office hours are Monday to Friday, 9am to 6pm, and support tickets are answered within one business day.",
+    "The company offers digital marketing, search engine optimisation and social media management packages.",
+]
+
+
+def sample_texts(source: str, n: int) -> List[str]:
+    """Up to n chunks from source (or the built-in sample), cycled to exactly n texts."""
+    texts = [chunk.text for chunk in islice(iter_chunks(source), n)] if os.path.exists(source) else []
+    texts = texts or SAMPLE_TEXTS
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=sorted(ENCODER_BACKENDS))
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--source", default=os.path.join("data", "website_data.txt"))
+    parser.add_argument("--queries", type=int, default=50, help="single-text encodes to time")
+    parser.add_argument("--chunks", type=int, default=256, help="texts in the batched run")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    queries = [text[:200] for text in sample_texts(args.source, args.queries)]
+    chunks = sample_texts(args.source, args.chunks)
+    options = {"threads": args.threads} if args.threads else {}
+
+    print(f"{'backend':>12} {'load s':>8} {'query p50 ms':>13} {'query p95 ms':>13} {'batch chunks/s':>15}")
+    for backend in args.backends:
+        start = time.perf_counter()
+        try:
+            encoder = load_encoder(backend, args.model, options)
+        except ImportError as e:
+            print(f"{backend:>12} skipped: {e}")
+            continue
+        load_s = time.perf_counter() - start
+        encoder.encode(queries[:1])  # warm-up, excluded from timings
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            encoder.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        encoder.encode(chunks, batch_size=args.batch_size)
+        throughput = len(chunks) / (time.perf_counter() - start)
+        print(f"{backend:>12} {load_s:>8.1f} {np.percentile(latencies, 50):>13.2f} "
+              f"{np.percentile(latencies, 95):>13.2f} {throughput:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
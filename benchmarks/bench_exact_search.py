@@ -0,0 +1,66 @@
+"""
+Benchmark ExactSearchIndex against the previous sklearn NearestNeighbors path.
+
+Usage:
+    python benchmarks/bench_exact_search.py --sizes 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_index import ExactSearchIndex, normalize_rows
+
+
+def random_embeddings(n: int, dim: int, seed: int) -> np.ndarray:
+    """Generate unit-norm float32 vectors in blocks to keep peak memory down."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        block = rng.standard_normal((min(100_000, n - start), dim), dtype=np.float32)
+        out[start:start + len(block)] = normalize_rows(block)
+    return out
+
+
+def time_queries(index, queries: np.ndarray, k: int):
+    """Run one query at a time, as TextVectorizer.search does, and return (ms/query, indices)."""
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        _, idx = index.kneighbors(q.reshape(1, -1), n_neighbors=k)
+        results.append(idx[0])
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / len(queries), np.array(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>10} {'sklearn ms/q':>14} {'exact ms/q':>12} {'speedup':>9} {'agreement':>10}")
+    for n in args.sizes:
+        embeddings = random_embeddings(n, args.dim, seed=n)
+        queries = random_embeddings(args.queries, args.dim, seed=0)
+
+        sk_index = NearestNeighbors(n_neighbors=args.k, metric="cosine", algorithm="auto").fit(embeddings)
+        sk_ms, sk_idx = time_queries(sk_index, queries, args.k)
+
+        exact_index = ExactSearchIndex(embeddings, normalized=True)
+        ex_ms, ex_idx = time_queries(exact_index, queries, args.k)
+
+        agreement = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(sk_idx, ex_idx)])
+        print(f"{n:>10} {sk_ms:>14.2f} {ex_ms:>12.2f} {sk_ms / ex_ms:>8.1f}x {agreement:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
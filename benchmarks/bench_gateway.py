@@ -0,0 +1,98 @@
+"""
+Burst of concurrent sessions against a concurrency-limited stub, with and without LLMGateway.
+
+The stub answers at most --upstream-limit requests at a time and returns 429
+for the rest, like a rate-limited plan. One greedy session fires --greedy
+questions at once while --sessions other sessions ask --per-session each.
+Reports failed (429) answers, busy rejections and per-session latency, directly
+through RAGLLM from one thread per question and through the gateway.
+
+Usage:
+    python benchmarks/bench_gateway.py --sessions 6 --greedy 20 --upstream-limit 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sse_stub_server import start_server
+from utils.llm_gateway import GatewayBusyError, LLMGateway
+from utils.rag_llm import RAGLLM
+
+CHUNKS = ["Jiva Infotech is a technology company."]
+
+
+def burst(ask, questions):
+    """Run ask(session_id) for every (session_id) in questions at once; latencies and outcomes per session."""
+    latencies, outcomes = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+
+    def one(session_id: str):
+        start = time.perf_counter()
+        try:
+            "".join(ask(session_id))
+            outcome = "ok"
+        except GatewayBusyError:
+            outcome = "busy"
+        except Exception:
+            outcome = "failed"
+        with lock:
+            outcomes[outcome] += 1
+            if outcome == "ok":
+                latencies[session_id].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=one, args=(session_id,)) for session_id in questions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes
+
+
+def report(name, latencies, outcomes):
+    greedy = latencies.pop("greedy", [])
+    others = [value for values in latencies.values() for value in values]
+    p95 = lambda values: f"{np.percentile(values, 95):>8.2f}" if values else f"{'-':>8}"
+    print(f"{name:>8} {outcomes['ok']:>5} {outcomes['failed']:>7} {outcomes['busy']:>5} {p95(greedy)} {p95(others)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=6)
+    parser.add_argument("--per-session", type=int, default=2)
+    parser.add_argument("--greedy", type=int, default=20)
+    parser.add_argument("--upstream-limit", type=int, default=4, help="concurrent requests the stub accepts")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--max-wait", type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = start_server(0, ttft=args.ttft, token_delay=0.01, max_concurrent=args.upstream_limit)
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    questions = ["greedy"] * args.greedy + [f"user-{i}" for i in range(args.sessions)] * args.per_session
+
+    print(f"{len(questions)} questions at once, upstream accepts {args.upstream_limit} concurrent requests")
+    print(f"{'client':>8} {'ok':>5} {'failed':>7} {'busy':>5} {'greedy p95 s':>8} {'others p95 s':>8}")
+    direct = RAGLLM("stub-key", api_url=url, retries=0)
+    report("direct", *burst(lambda session_id: direct.generate_response_stream("q", CHUNKS), questions))
+
+    gateway = LLMGateway(RAGLLM("stub-key", api_url=url, retries=0), workers=args.upstream_limit,
+                         requests_per_minute=6000, burst=args.upstream_limit, max_wait=args.max_wait,
+                         coalesce=False)  # every caller asks the same "q"; measure queuing, not coalescing
+    report("gateway", *burst(lambda session_id: gateway.generate_response_stream("q", CHUNKS, session_id),
+                             questions))
+    gateway_metrics = gateway.metrics()["gateway"]
+    print(f"Gateway wait p50 {gateway_metrics['wait_p50']:.2f}s, p95 {gateway_metrics['wait_p95']:.2f}s, "
+          f"shed {gateway_metrics['shed_total']}")
+    gateway.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Tail latency of hedged multi-model requests against the local stub.
+
+The stub gives the primary model a heavy tail (a fraction of requests take
+--slow-ttft seconds to the first token) while the secondary answers steadily.
+Compares time to first token for the primary alone, and for RAGLLM racing
+both models with an adaptive (p95) and a fixed hedge delay.
+
+Usage:
+    python benchmarks/bench_hedging.py --requests 60 --slow-fraction 0.1
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sse_stub_server import start_server
+from utils.rag_llm import RAGLLM
+
+PRIMARY, SECONDARY = "stub/primary", "stub/secondary"
+MESSAGES = [{"role": "user", "content": "What does Jiva Infotech do?"}]
+
+
+def time_to_first_token(llm: RAGLLM, n: int) -> np.ndarray:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        stream = llm.stream_response(MESSAGES)
+        next(stream)
+        latencies.append((time.perf_counter() - start) * 1000)
+        for _ in stream:
+            pass
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--fast-ttft", type=float, default=0.1, help="usual seconds to first token")
+    parser.add_argument("--slow-ttft", type=float, default=2.0, help="primary's tail seconds to first token")
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="share of primary requests in the tail")
+    parser.add_argument("--secondary-ttft", type=float, default=0.3)
+    parser.add_argument("--hedge-delay", type=float, default=0.5, help="fixed delay for the comparison run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    def ttft_for(model: str) -> float:
+        if model == PRIMARY:
+            return args.slow_ttft if rng.random() < args.slow_fraction else args.fast_ttft
+        return args.secondary_ttft
+
+    server = start_server(0, token_delay=0.0, ttft_for=ttft_for)
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    clients = {
+        "primary": RAGLLM("stub-key", api_url=url, models=[PRIMARY]),
+        "adaptive": RAGLLM("stub-key", api_url=url, models=[PRIMARY, SECONDARY]),
+        "fixed": RAGLLM("stub-key", api_url=url, models=[PRIMARY, SECONDARY], hedge_delay=args.hedge_delay),
+    }
+    # Let the adaptive client learn its histograms before measuring
+    clients["adaptive"].hedge_policy.min_samples = 10
+    time_to_first_token(clients["adaptive"], 20)
+
+    print(f"{args.requests} streamed requests, primary tail {args.slow_fraction:.0%} at {args.slow_ttft}s")
+    print(f"{'client':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'hedges':>7} {'wins':>5}")
+    for name, llm in clients.items():
+        before = llm.hedge_policy.metrics()
+        latencies = time_to_first_token(llm, args.requests)
+        after = llm.hedge_policy.metrics()
+        print(f"{name:>9} {np.percentile(latencies, 50):>9.0f} {np.percentile(latencies, 95):>9.0f} "
+              f"{np.percentile(latencies, 99):>9.0f} {after['hedges_total'] - before['hedges_total']:>7} "
+              f"{after['hedge_wins'] - before['hedge_wins']:>5}")
+    delay = clients["adaptive"].hedge_policy.delay(PRIMARY)
+    print(f"Adaptive hedge delay for {PRIMARY}: {delay * 1000:.0f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
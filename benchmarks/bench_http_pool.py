@@ -0,0 +1,116 @@
+"""
+Connection reuse benchmark for RAGLLM against a local HTTPS stand-in.
+
+Generates a throwaway self-signed certificate with openssl, serves the stub
+completions endpoint (benchmarks/sse_stub_server.py) over TLS with zero model
+latency, and compares per-request latency and TCP + TLS handshakes for:
+
+- fresh: a module-level requests.post per question (the old behaviour);
+- pooled: RAGLLM's keep-alive session;
+- async: AsyncRAGLLM with concurrent callers (only if aiohttp is installed).
+
+Usage:
+    python benchmarks/bench_http_pool.py --requests 50 --concurrency 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sse_stub_server import start_server
+from utils.rag_llm import RAGLLM
+
+MESSAGES = [{"role": "user", "content": "What does Jiva Infotech do?"}]
+
+
+def self_signed_certificate(directory: str):
+    """Write cert.pem / key.pem for 127.0.0.1 and return their paths."""
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def timed(call, n: int):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+async def timed_async(llm, n: int, concurrency: int):
+    async def worker(count: int):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            await llm.get_response(MESSAGES)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    counts = [n // concurrency + (i < n % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(worker(count) for count in counts if count))
+    elapsed = time.perf_counter() - start
+    await llm.aclose()
+    return np.concatenate(results), elapsed
+
+
+def report(name: str, latencies: np.ndarray, connections: int):
+    print(f"{name:>8} {np.mean(latencies):>9.2f} {np.percentile(latencies, 50):>9.2f} "
+          f"{np.percentile(latencies, 95):>9.2f} {connections:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent callers for the async client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = self_signed_certificate(directory)
+        # Trust the throwaway certificate in requests (REQUESTS_CA_BUNDLE) and aiohttp (SSL_CERT_FILE)
+        os.environ["REQUESTS_CA_BUNDLE"] = os.environ["SSL_CERT_FILE"] = certfile
+        server = start_server(0, ttft=0.0, token_delay=0.0, certfile=certfile, keyfile=keyfile)
+        url = f"https://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+        llm = RAGLLM("stub-key", api_url=url)
+
+        print(f"{args.requests} sequential requests over TLS to {url}")
+        print(f"{'client':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'connections':>12}")
+
+        server.connections = 0
+        fresh = timed(lambda: requests.post(url, headers=llm._headers(), json=llm._payload(MESSAGES), timeout=30).json(),
+                      args.requests)
+        report("fresh", fresh, server.connections)
+
+        server.connections = 0
+        pooled = timed(lambda: llm.get_response(MESSAGES), args.requests)
+        report("pooled", pooled, server.connections)
+        print(f"Handshake savings: {np.mean(fresh) - np.mean(pooled):.2f} ms per request")
+
+        try:
+            from utils.async_rag_llm import AsyncRAGLLM
+            async_llm = AsyncRAGLLM("stub-key", api_url=url, pool_size=args.concurrency)
+        except ImportError as e:
+            print(f"async client skipped: {e}")
+        else:
+            server.connections = 0
+            latencies, elapsed = asyncio.run(timed_async(async_llm, args.requests, args.concurrency))
+            report("async", latencies, server.connections)
+            print(f"Async throughput with {args.concurrency} callers: {args.requests / elapsed:.1f} requests/s")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Footprint, latency and top-k overlap of QuantizedSearchIndex versus float32 exact search.
+
+Usage:
+    python benchmarks/bench_quantization.py --sizes 100000 1000000
+    python benchmarks/bench_quantization.py --store data/vector_store
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_ann_recall import clustered_embeddings, timed_search
+from utils.quantization import QUANTIZATION_TYPES, QuantizedSearchIndex
+from utils.search_index import ExactSearchIndex, normalize_rows
+from utils.vector_store import load_store
+
+
+def report(embeddings: np.ndarray, queries: np.ndarray, k: int, rescore: int):
+    exact_ms, truth = timed_search(ExactSearchIndex(embeddings, normalized=True), queries, k)
+    full_mb = embeddings.nbytes / 2 ** 20
+
+    print(f"\n{len(embeddings)} chunks, k={k}, rescore={rescore}")
+    print(f"{'format':>8} {'memory MB':>10} {'ratio':>6} {'ms/q':>8} {'overlap@' + str(k):>10}")
+    print(f"{'float32':>8} {full_mb:>10.1f} {1.0:>6.1f} {exact_ms:>8.2f} {1.0:>10.3f}")
+    for quantization in QUANTIZATION_TYPES:
+        index = QuantizedSearchIndex(embeddings, normalized=True, quantization=quantization, rescore=rescore)
+        ms, found = timed_search(index, queries, k)
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(truth, found)])
+        mb = index.nbytes() / 2 ** 20
+        print(f"{quantization:>8} {mb:>10.1f} {full_mb / mb:>6.1f} {ms:>8.2f} {overlap:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--store", help="vector store directory to benchmark instead of synthetic data")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rescore", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.store:
+        _, embeddings, _ = load_store(args.store)
+        rng = np.random.default_rng(0)
+        picks = np.asarray(embeddings[rng.choice(len(embeddings), args.queries)])
+        queries = normalize_rows(picks + rng.standard_normal(picks.shape, dtype=np.float32) * 0.05)
+        report(embeddings, queries, args.k, args.rescore)
+        return
+
+    for n in args.sizes:
+        data = clustered_embeddings(n + args.queries, args.dim, n_topics=max(10, n // 1000), seed=n)
+        report(data[:n], data[n:], args.k, args.rescore)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Upstream calls during a burst of identical questions, with and without single-flight coalescing.
+
+--users sessions each ask one of --questions distinct questions (spelled with
+random case and spacing) at the same moment, through LLMGateway. Reports
+upstream requests seen by the stub and the time for every user to get a full
+streamed answer.
+
+Usage:
+    python benchmarks/bench_single_flight.py --users 40 --questions 3
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sse_stub_server import CANNED_ANSWER, start_server
+from utils.llm_gateway import LLMGateway
+from utils.rag_llm import RAGLLM
+
+QUESTIONS = ["What does Jiva Infotech do?", "How can I contact Jiva Infotech?", "Do you build mobile apps?",
+             "Where is the office?", "What are your working hours?"]
+CHUNKS = ["Jiva Infotech is a technology company."]
+
+
+def spelling(question: str, rng: random.Random) -> str:
+    question = question.lower() if rng.random() < 0.5 else question.upper()
+    return rng.choice(["", " ", "  "]) + question.replace(" ", rng.choice([" ", "  "]))
+
+
+def burst(gateway: LLMGateway, asks):
+    answers = []
+    threads = [threading.Thread(target=lambda i=i, q=q: answers.append(
+        "".join(gateway.generate_response_stream(q, CHUNKS, session_id=f"user-{i}")))) for i, q in enumerate(asks)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=3, choices=range(1, len(QUESTIONS) + 1))
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    asks = [spelling(rng.choice(QUESTIONS[:args.questions]), rng) for _ in range(args.users)]
+    server = start_server(0, ttft=args.ttft, token_delay=0.01)
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+
+    print(f"{args.users} users, {args.questions} distinct questions")
+    print(f"{'coalesce':>9} {'upstream calls':>15} {'complete answers':>17} {'burst s':>8}")
+    for coalesce in (False, True):
+        gateway = LLMGateway(RAGLLM("stub-key", api_url=url, pool_size=8), workers=8, requests_per_minute=6000,
+                             burst=args.users, max_wait=60.0, coalesce=coalesce)
+        server.requests = 0
+        answers, elapsed = burst(gateway, asks)
+        complete = sum(answer.split() == CANNED_ANSWER.split() for answer in answers)
+        print(f"{str(coalesce):>9} {server.requests:>15} {complete:>17} {elapsed:>8.2f}")
+        gateway.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark for the Streamlit entry point.
+
+Each measurement runs in a fresh interpreter so nothing is already imported:
+
+- import time: `python -X importtime` over the modules streamlit_app.py pulls in
+  before the first paint, reporting the slowest modules and failing if any
+  heavy ML package (torch, sentence_transformers, ...) is among them;
+- time to first paint: process start until streamlit_app.py has rendered once
+  (Streamlit's AppTest, no browser);
+- time to first answer: from first paint until the first chat question has
+  been answered, which includes loading the model and the vector store.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --question "What services do you offer?" --api-key $OPENROUTER_API_KEY
+    python benchmarks/bench_startup.py --max-import-ms 1500 --max-paint-ms 3000   # exit 1 on regression
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported before the first paint
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "sklearn", "onnxruntime")
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(modules: List[str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """Return (total ms, [(module, cumulative ms)] for every module imported) when importing modules cold."""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {modules} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(2)) / 1000, len(match.group(3))))
+    top_level = [(name, ms) for name, ms, depth in entries if depth == 1]
+    return sum(ms for _, ms in top_level), [(name, ms) for name, ms, _ in entries]
+
+
+def _child(args: argparse.Namespace):
+    """Runs in a fresh interpreter: render the app once, then optionally ask one question."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(PROJECT_ROOT, "streamlit_app.py"), default_timeout=args.timeout)
+    if args.api_key:
+        app.secrets["openrouter"] = {"api_key": args.api_key}
+    app.run()
+    timings = {"first_paint_ms": (time.time() - args.started) * 1000}
+    if app.exception:
+        timings["error"] = str(app.exception[0].value)
+
+    if args.question and not app.exception:
+        start = time.perf_counter()
+        app.chat_input[0].set_value(args.question).run()
+        timings["first_answer_ms"] = (time.perf_counter() - start) * 1000
+        if app.exception:
+            timings["error"] = str(app.exception[0].value)
+    print(json.dumps(timings))
+
+
+def app_timings(question: Optional[str], api_key: Optional[str], timeout: float) -> Dict[str, float]:
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--started", repr(time.time()),
+               "--timeout", str(timeout)]
+    if question:
+        command += ["--question", question]
+    if api_key:
+        command += ["--api-key", api_key]
+    result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"App run failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["streamlit", "app.main"],
+                        help="modules imported before the first paint")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--question", default=None, help="ask this question to measure time to first answer")
+    parser.add_argument("--api-key", default=os.environ.get("OPENROUTER_API_KEY"))
+    parser.add_argument("--timeout", type=float, default=600.0, help="AppTest timeout per run, seconds")
+    parser.add_argument("--skip-app", action="store_true", help="only profile imports")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-paint-ms", type=float, default=None)
+    parser.add_argument("--max-answer-ms", type=float, default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--started", type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    failures = []
+    total_ms, entries = import_profile(args.modules)
+    print(f"Import time for {', '.join(args.modules)}: {total_ms:.0f} ms")
+    for name, ms in sorted(entries, key=lambda entry: entry[1], reverse=True)[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    heavy = sorted({name.split(".")[0] for name, _ in entries} & set(HEAVY_MODULES))
+    if heavy:
+        failures.append(f"heavy modules imported before first paint: {', '.join(heavy)}")
+    if args.max_import_ms is not None and total_ms > args.max_import_ms:
+        failures.append(f"import time {total_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+
+    if not args.skip_app:
+        timings = app_timings(args.question, args.api_key, args.timeout)
+        print(f"Time to first paint:  {timings['first_paint_ms']:.0f} ms")
+        if "first_answer_ms" in timings:
+            print(f"Time to first answer: {timings['first_answer_ms']:.0f} ms after first paint")
+        if "error" in timings:
+            print(f"App raised: {timings['error']}")
+        for key, limit in (("first_paint_ms", args.max_paint_ms), ("first_answer_ms", args.max_answer_ms)):
+            if limit is not None and timings.get(key, 0.0) > limit:
+                failures.append(f"{key} {timings[key]:.0f} ms > {limit:.0f} ms")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
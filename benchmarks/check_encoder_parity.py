@@ -0,0 +1,72 @@
+"""
+Parity check of the quantized encoder backends against the float32 reference.
+
+Encodes the same texts with the "torch" backend and each other backend and
+reports per-text cosine similarity between the two embeddings, plus how often
+each text's nearest neighbours among the sample stay the same. Exits with
+status 1 when any backend's minimum cosine falls below --min-cosine.
+
+Usage:
+    python benchmarks/check_encoder_parity.py
+    python benchmarks/check_encoder_parity.py --backends torch-int8 onnx --min-cosine 0.98
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_encoders import sample_texts
+from utils.encoder_backends import ENCODER_BACKENDS, load_encoder
+from utils.search_index import normalize_rows, top_k
+
+
+def neighbour_overlap(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean overlap of each text's top-k neighbours (excluding itself) under both embeddings."""
+    k = min(k, len(reference) - 1)
+    if k <= 0:
+        return 1.0
+    overlaps = []
+    for embeddings in (reference, candidate):
+        scores = embeddings @ embeddings.T
+        np.fill_diagonal(scores, -np.inf)
+        overlaps.append(top_k(scores, k)[0])
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(*overlaps)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=[name for name in sorted(ENCODER_BACKENDS) if name != "torch"])
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--source", default=os.path.join("data", "website_data.txt"))
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    texts = list(dict.fromkeys(sample_texts(args.source, args.texts)))
+    reference = normalize_rows(load_encoder("torch", args.model).encode(texts))
+
+    failed = False
+    print(f"{len(texts)} texts, reference: torch float32")
+    print(f"{'backend':>12} {'min cos':>8} {'mean cos':>9} {'top-' + str(args.k) + ' overlap':>14}")
+    for backend in args.backends:
+        try:
+            encoder = load_encoder(backend, args.model)
+        except ImportError as e:
+            print(f"{backend:>12} skipped: {e}")
+            continue
+        candidate = normalize_rows(encoder.encode(texts))
+        cosines = np.sum(reference * candidate, axis=1)
+        overlap = neighbour_overlap(reference, candidate, args.k)
+        status = "" if cosines.min() >= args.min_cosine else "  FAIL"
+        failed = failed or bool(status)
+        print(f"{backend:>12} {cosines.min():>8.4f} {cosines.mean():>9.4f} {overlap:>14.3f}{status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
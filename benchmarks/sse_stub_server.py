@@ -0,0 +1,199 @@
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+Answers POST /api/v1/chat/completions with a canned completion after a
+configurable time to first token and per-token delay, either as one JSON body
+or, for "stream": true, as server-sent events in OpenRouter's format
+(including its ": OPENROUTER PROCESSING" keep-alive comments). Point the app
+at it with
+
+    [openrouter]
+    api_key = "anything"
+    api_url = "http://127.0.0.1:8765/api/v1/chat/completions"
+
+Usage:
+    python benchmarks/sse_stub_server.py --port 8765 --ttft 0.8 --token-delay 0.03
+    python benchmarks/sse_stub_server.py --bench   # time-to-first-token vs blocking latency through RAGLLM
+"""
+
+import os
+import sys
+import json
+import ssl
+import time
+import argparse
+import threading
+from typing import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CANNED_ANSWER = ("Jiva Infotech provides custom software development, web and mobile applications, "
+                 "cloud migration and digital marketing services for businesses of every size. "
+                 "You can reach the team through the contact form on the website.")
+
+
+def make_handler(ttft: float, token_delay: float, answer: str = CANNED_ANSWER,
+                 ttft_for: Callable[[str], float] = None, max_concurrent: int = None):
+    """ttft_for(model), if given, overrides ttft per request, e.g. to give one model a slow tail.
+
+    With max_concurrent, requests beyond that many in flight get a 429 like a rate-limited upstream.
+    """
+    tokens = [word + " " for word in answer.split()]
+    in_flight = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self.server.requests += 1
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send_json(401, {"error": {"message": "Missing API key"}})
+                return
+            if in_flight is not None and not in_flight.acquire(blocking=False):
+                self._send_json(429, {"error": {"message": "Rate limit exceeded"}})
+                return
+            try:
+                self._answer(body)
+            finally:
+                if in_flight is not None:
+                    in_flight.release()
+
+        def _answer(self, body: dict):
+            model = body.get("model", "stub")
+            delay = ttft_for(model) if ttft_for else ttft
+            if body.get("stream"):
+                self._stream(model, delay)
+            else:
+                time.sleep(delay + token_delay * len(tokens))
+                self._send_json(200, {"model": model, "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}]})
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, model: str, ttft: float):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self._write_chunk(": OPENROUTER PROCESSING\n\n")
+            time.sleep(ttft)
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(token_delay)
+                event = {"model": model, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded server that counts accepted connections, i.e. TCP (+ TLS) handshakes, and requests."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, ssl_context: ssl.SSLContext = None):
+        super().__init__(address, handler)
+        self.ssl_context = ssl_context
+        self.connections = 0
+        self.requests = 0
+
+    def get_request(self):
+        sock, address = super().get_request()
+        self.connections += 1
+        if self.ssl_context is not None:
+            # Handshake lazily in the handler thread rather than in the accept loop
+            sock = self.ssl_context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return sock, address
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # the client hung up mid-stream, e.g. a cancelled hedge
+        super().handle_error(request, client_address)
+
+
+def start_server(port: int = 0, ttft: float = 0.8, token_delay: float = 0.03, certfile: str = None,
+                 keyfile: str = None, ttft_for: Callable[[str], float] = None,
+                 max_concurrent: int = None) -> StubServer:
+    """Serve the stub in a daemon thread; port 0 picks a free port (see server.server_address).
+
+    With certfile/keyfile the stub speaks HTTPS, so clients pay a real TLS handshake per connection.
+    """
+    ssl_context = None
+    if certfile:
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(certfile, keyfile)
+    server = StubServer(("127.0.0.1", port), make_handler(ttft, token_delay, ttft_for=ttft_for, max_concurrent=max_concurrent),
+                        ssl_context)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(server: StubServer, runs: int):
+    from utils.rag_llm import RAGLLM
+
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    llm = RAGLLM("stub-key", api_url=url)
+    chunks = ["Jiva Infotech is a technology company."]
+    blocking, first_token, streamed = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        llm.generate_response("What does Jiva Infotech do?", chunks)
+        blocking.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i, _ in enumerate(llm.generate_response_stream("What does Jiva Infotech do?", chunks)):
+            if i == 0:
+                first_token.append(time.perf_counter() - start)
+        streamed.append(time.perf_counter() - start)
+
+    ms = lambda values: f"{1000 * sum(values) / len(values):8.0f} ms"
+    print(f"Blocking response (perceived latency): {ms(blocking)}")
+    print(f"Streaming time to first token:         {ms(first_token)}")
+    print(f"Streaming full response:               {ms(streamed)}")
+    print(f"Connections opened for {2 * runs} requests: {server.connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.8, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="seconds between tokens")
+    parser.add_argument("--bench", action="store_true", help="measure RAGLLM against the stub and exit")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_server(0 if args.bench else args.port, args.ttft, args.token_delay)
+    if args.bench:
+        bench(server, args.runs)
+        server.shutdown()
+        return
+    print(f"Serving stub completions on http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# app.main only imports light modules; the model and vector store load in a background warm-up
+# started on the first page render, so the UI appears before they are ready
 try:
     from app.main import main
     main()
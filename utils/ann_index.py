@@ -0,0 +1,140 @@
+"""
+Approximate nearest-neighbour search with an inverted-file (IVF) index.
+
+Embeddings are partitioned into nlist clusters by spherical k-means. A query
+only scores the chunks in its nprobe closest clusters, so latency grows with
+roughly nprobe / nlist of the corpus instead of all of it. Raising nprobe
+trades speed for recall; nprobe == nlist is exact search.
+
+The inverted lists are stored CSR-style (list_offsets, list_ids), so the index
+persists as three small arrays next to the vector store and is memory-mapped on
+load like the embeddings themselves.
+"""
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.search_index import SearchIndex, normalize_rows, top_k
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity and return unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_clusters)
+        # Re-seed empty clusters from random points so every list stays useful
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex(SearchIndex):
+    """Inverted-file index with k-means coarse quantization."""
+
+    index_type = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False, nlist: Optional[int] = None,
+                 nprobe: int = 8, train_size: int = 64, n_iter: int = 10, seed: int = 0):
+        super().__init__(embeddings, normalized)
+        n = len(self.embeddings)
+        self.requested_nlist = nlist  # as configured; nlist below is clamped to the corpus size
+        if nlist is None:
+            nlist = int(4 * math.sqrt(n))
+        self.nlist = max(1, min(nlist, n))
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        if n:
+            self._train(train_size, n_iter, seed)
+
+    def _train(self, train_size: int, n_iter: int, seed: int):
+        """Fit centroids on a sample, then assign every embedding to its closest list."""
+        n = len(self.embeddings)
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, self.nlist * train_size)
+        sample = np.asarray(self.embeddings[np.sort(rng.choice(n, sample_size, replace=False))])
+        self.centroids = spherical_kmeans(sample, self.nlist, n_iter, seed)
+
+        labels = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = self.embeddings[start:start + 65536]
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+
+        # A stable sort keeps ids ascending within each list, which keeps memory-mapped reads sequential
+        self.list_ids = np.argsort(labels, kind="stable").astype(np.int64)
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.nlist), out=self.list_offsets[1:])
+
+    def params(self) -> Dict[str, Any]:
+        """Build parameters that must match for a persisted index to be reused.
+
+        nlist is the configured value, not the clamped one, so a config asking for more lists than
+        the corpus has chunks still matches the index it produced.
+        """
+        return {"nlist": self.requested_nlist, "train_size": self.train_size, "n_iter": self.n_iter, "seed": self.seed}
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist alongside the vector store."""
+        if self.centroids is None:
+            return {}  # empty corpus: nothing was trained
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_list_offsets": self.list_offsets,
+            "ivf_list_ids": self.list_ids,
+        }
+
+    @classmethod
+    def from_arrays(cls, embeddings: np.ndarray, arrays: Dict[str, np.ndarray], nprobe: int = 8,
+                    **build_params) -> "IVFIndex":
+        """Restore a persisted index without retraining; build parameters are already baked in."""
+        if "ivf_centroids" not in arrays:
+            return cls(embeddings, normalized=True, nprobe=nprobe, **build_params)
+        index = cls.__new__(cls)
+        SearchIndex.__init__(index, embeddings, normalized=True)
+        index.centroids = arrays["ivf_centroids"]
+        index.list_offsets = arrays["ivf_list_offsets"]
+        index.list_ids = arrays["ivf_list_ids"]
+        index.nlist = len(index.centroids)
+        index.requested_nlist = build_params.get("nlist", index.nlist)
+        index.nprobe = nprobe
+        index.train_size = build_params.get("train_size", 64)
+        index.n_iter = build_params.get("n_iter", 10)
+        index.seed = build_params.get("seed", 0)
+        return index
+
+    def _candidates(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Ids in the nprobe closest lists, probing further if they hold fewer than k chunks."""
+        order = np.argsort(-(self.centroids @ query))
+        sizes = np.diff(self.list_offsets)[order]
+        n_probe = max(self.nprobe, int(np.searchsorted(np.cumsum(sizes), k)) + 1)
+        lists = order[:n_probe]
+        return np.concatenate([self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+
+    def kneighbors(self, query_vectors: np.ndarray, n_neighbors: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        k = min(n_neighbors, len(self.embeddings))
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        if self.centroids is None:
+            return distances, indices  # empty corpus, like ExactSearchIndex
+
+        for row, query in enumerate(queries):
+            ids = self._candidates(query, k)
+            scores = self.embeddings[ids] @ query
+            best, sims = top_k(scores[np.newaxis, :], k)
+            indices[row] = ids[best[0]]
+            distances[row] = 1.0 - sims[0]
+
+        return distances, indices
@@ -0,0 +1,125 @@
+"""
+asyncio client for serving many concurrent callers from one event loop.
+
+Prompts, payloads, error messages and per-model circuit breakers come from
+LLMClientBase, shared with RAGLLM; requests go through one aiohttp
+ClientSession whose connector keeps up to pool_size keep-alive connections
+open. With several models configured a failed request falls back to the next
+model; there is no hedging. aiohttp is optional and only needed for this
+client.
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, List, Tuple
+
+from utils.rag_llm import OPENROUTER_API_URL, LLMClientBase
+from utils.resilience import AccountError, FatalError, LLMError, RetryableError, parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, checked when the client is created
+    aiohttp = None
+
+
+class AsyncRAGLLM(LLMClientBase):
+    """Coroutine get_response / generate_response and async streaming over one aiohttp session."""
+
+    def __init__(self, api_key: str, api_url: str = OPENROUTER_API_URL, pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0, keep_alive: bool = True,
+                 retries: int = 3, deadline: float = 45.0, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 models: List[str] = None):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for AsyncRAGLLM: pip install aiohttp")
+        super().__init__(api_key, api_url, connect_timeout, read_timeout, retries, deadline, failure_threshold,
+                         recovery_timeout, models)
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._session = None  # created inside the running event loop
+
+    def _client(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=not self.keep_alive)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self._headers())
+        return self._session
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self) -> "AsyncRAGLLM":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _post(self, messages: List[Dict[str, str]], stream: bool) -> Tuple[str, "aiohttp.ClientResponse"]:
+        """(model, response) from the first model that answers, each behind its own retry policy and breaker.
+
+        With fallback models configured every model gets a single attempt, as in RAGLLM's hedged race.
+        """
+        retries = 0 if len(self.models) > 1 else None
+        errors = []
+        for model in self.models:
+            try:
+                response = await self.retry_policies[model].acall(
+                    lambda remaining: self._post_once(messages, stream, remaining, model), retries=retries)
+                return model, response
+            except AccountError:
+                raise  # a bad key or an empty account fails the same way for every model
+            except LLMError as e:
+                errors.append(e)
+        raise errors[0]  # every model failed: report the primary's error
+
+    async def _post_once(self, messages: List[Dict[str, str]], stream: bool, remaining: float,
+                         model: str) -> "aiohttp.ClientResponse":
+        connect_timeout, read_timeout = self._request_timeout(remaining)
+        timeout = aiohttp.ClientTimeout(total=None if stream else remaining, sock_connect=connect_timeout,
+                                        sock_read=read_timeout)
+        try:
+            response = await self._client().post(self.api_url, json=self._payload(messages, stream=stream, model=model),
+                                                 timeout=timeout)
+        except asyncio.TimeoutError:
+            raise RetryableError("API request timed out. Please try again.")
+        except aiohttp.ClientConnectionError:
+            raise RetryableError("Failed to connect to API. Please check your internet connection.")
+        except aiohttp.ClientError as e:
+            raise RetryableError(f"API request failed: {str(e)}")
+        if response.status >= 400:
+            text = await response.text()
+            response.release()
+            raise self._status_error(response.status, text, parse_retry_after(response.headers.get("Retry-After")))
+        return response
+
+    async def get_response(self, messages: List[Dict[str, str]]) -> str:
+        """Get response from OpenRouter API with retry logic."""
+        _, response = await self._post(messages, stream=False)
+        async with response:
+            result = await response.json(content_type=None)
+        if "choices" not in result or not result["choices"]:
+            raise FatalError("Invalid response format from API")
+        return result["choices"][0]["message"]["content"]
+
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Yield the completion text piece by piece as server-sent events arrive."""
+        model, response = await self._post(messages, stream=True)
+        async with response:
+            try:
+                async for raw_line in response.content:
+                    content = self._event_content(raw_line.decode("utf-8").strip())
+                    if content:
+                        yield content
+            except asyncio.TimeoutError:
+                self.breakers[model].record_failure()
+                raise RetryableError("API request timed out. Please try again.")
+            except aiohttp.ClientError as e:
+                self.breakers[model].record_failure()
+                raise RetryableError(f"API request failed: {str(e)}")
+
+    async def generate_response(self, query: str, context_chunks: List[str]) -> str:
+        """Generate a response using RAG."""
+        return await self.get_response(self.build_prompt(query, context_chunks))
+
+    def generate_response_stream(self, query: str, context_chunks: List[str]) -> AsyncIterator[str]:
+        """Generate a response using RAG, yielding text as it is produced."""
+        return self.stream_response(self.build_prompt(query, context_chunks))
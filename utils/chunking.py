@@ -0,0 +1,152 @@
+"""
+Streaming text chunker.
+
+Reads a file or an iterable of documents incrementally and keeps only a sliding
+window of chunk_size words in memory. Each chunk is yielded with the character
+offsets of its first and last word in the source document, so a corpus of any
+size can be streamed straight into the embedding step. Chunk boundaries match
+TextVectorizer.get_text_chunks exactly.
+
+Given a tokenizer, chunk_size and overlap are measured in the encoder's own
+word-piece tokens instead, so every chunk fits the model's max sequence length
+and no text is silently truncated at encode time.
+"""
+
+import re
+from collections import deque
+from itertools import islice
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+_WORD = re.compile(r"\S+")
+
+
+class TextChunk(NamedTuple):
+    text: str
+    doc_id: Union[int, str]
+    start: int  # character offset of the chunk's first word in its document
+    end: int  # character offset just past the chunk's last word
+
+
+def iter_file_words(path: str, block_size: int = 1 << 20) -> Iterator[Tuple[str, int, int]]:
+    """Yield (word, start, end) from a UTF-8 file, reading it in blocks."""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_text_words(iter(lambda: f.read(block_size), ""))
+
+
+def iter_text_words(pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+    """Yield (word, start, end) from consecutive pieces of one text, joining words split across pieces."""
+    carry, carry_start, offset = "", 0, 0
+    for piece in pieces:
+        text = carry + piece
+        base = offset - len(carry)
+        offset += len(piece)
+        words = list(_WORD.finditer(text))
+        # A word touching the end of the piece may continue in the next one
+        if words and words[-1].end() == len(text):
+            last = words.pop()
+            carry, carry_start = last.group(), base + last.start()
+        else:
+            carry = ""
+        for match in words:
+            yield match.group(), base + match.start(), base + match.end()
+    if carry:
+        yield carry, carry_start, carry_start + len(carry)
+
+
+def chunk_words(words: Iterable[Tuple[str, int, int]], doc_id: Union[int, str], chunk_size: int,
+                overlap: int) -> Iterator[TextChunk]:
+    """Group a word stream into overlapping chunks of chunk_size words."""
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap must be smaller than chunk_size")
+    window = deque()
+
+    def emit() -> TextChunk:
+        return TextChunk(" ".join(word for word, _, _ in window), doc_id, window[0][1], window[-1][2])
+
+    def advance():
+        for _ in range(min(step, len(window))):
+            window.popleft()
+
+    for word in words:
+        window.append(word)
+        if len(window) == chunk_size:
+            yield emit()
+            advance()
+    # Trailing chunks start inside the text but run short of chunk_size words
+    while window:
+        yield emit()
+        advance()
+
+
+def count_word_tokens(words: Iterable[Tuple[str, int, int]], tokenizer: Any, max_tokens: int,
+                      batch_size: int = 1024) -> Iterator[Tuple[str, int, int, int]]:
+    """Yield (word, start, end, n_tokens), tokenizing words in batches with a fast tokenizer.
+
+    Whitespace-delimited words tokenize independently, so per-word counts add up to
+    the count of the joined chunk. A word longer than max_tokens is split at token
+    offsets into pieces that each fit.
+    """
+    words = iter(words)
+    while True:
+        batch = list(islice(words, batch_size))
+        if not batch:
+            return
+        encoded = tokenizer([word for word, _, _ in batch], add_special_tokens=False, return_offsets_mapping=True)
+        for (word, start, _), offsets in zip(batch, encoded["offset_mapping"]):
+            if len(offsets) <= max_tokens:
+                yield word, start, start + len(word), max(len(offsets), 1)
+                continue
+            for i in range(0, len(offsets), max_tokens):
+                piece = offsets[i:i + max_tokens]
+                begin = piece[0][0] if i else 0
+                end = piece[-1][1] if i + max_tokens < len(offsets) else len(word)
+                yield word[begin:end], start + begin, start + end, len(piece)
+
+
+def chunk_tokens(words: Iterable[Tuple[str, int, int, int]], doc_id: Union[int, str], max_tokens: int,
+                 overlap: int) -> Iterator[TextChunk]:
+    """Pack token-counted words into chunks of at most max_tokens, repeating about overlap tokens between chunks."""
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than chunk_size")
+    window = deque()
+    window_tokens = 0
+    fresh = 0  # words added since the last emitted chunk
+
+    def emit() -> TextChunk:
+        return TextChunk(" ".join(word for word, _, _, _ in window), doc_id, window[0][1], window[-1][2])
+
+    for word in words:
+        n_tokens = word[3]
+        if window and window_tokens + n_tokens > max_tokens:
+            yield emit()
+            fresh = 0
+            # Keep a tail of at most overlap tokens that still leaves room for the next word
+            while window and (window_tokens > overlap or window_tokens + n_tokens > max_tokens):
+                window_tokens -= window.popleft()[3]
+        window.append(word)
+        window_tokens += n_tokens
+        fresh += 1
+    if fresh:
+        yield emit()
+
+
+def iter_chunks(source: Union[str, Iterable], chunk_size: int = 400, overlap: int = 50,
+                tokenizer: Optional[Any] = None) -> Iterator[TextChunk]:
+    """Stream chunks from a file path, an iterable of texts, or an iterable of (doc_id, text) pairs.
+
+    A file is treated as a single document. With a tokenizer, chunk_size and
+    overlap count tokens rather than words.
+    """
+    if isinstance(source, str):
+        documents = [(source, iter_file_words(source))]
+    else:
+        documents = ((document if isinstance(document, tuple) else (i, document)) for i, document in enumerate(source))
+        documents = ((doc_id, iter_text_words([text])) for doc_id, text in documents)
+
+    for doc_id, words in documents:
+        if tokenizer is None:
+            yield from chunk_words(words, doc_id, chunk_size, overlap)
+        else:
+            yield from chunk_tokens(count_word_tokens(words, tokenizer, chunk_size), doc_id, chunk_size, overlap)
+
@@ -0,0 +1,112 @@
+"""
+Near-duplicate chunk elimination with MinHash and locality-sensitive hashing.
+
+Crawled pages repeat large blocks of boilerplate (sidebars, CTAs, cookie
+banners), which turns into many near-identical chunks. Each chunk gets a MinHash
+signature over its word shingles; signatures are split into LSH bands so only
+chunks sharing a band bucket are compared, keeping the whole pass near-linear in
+the number of chunks. A chunk is dropped when its estimated Jaccard similarity
+to an already kept chunk reaches the threshold.
+"""
+
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1  # keeps a * x + b below 2**62, so uint64 arithmetic never overflows
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows == num_perm whose LSH threshold sits just below the target.
+
+    Erring low favours recall; false candidates are removed by the signature check.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    if not below:
+        return options[-1]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class DedupReport:
+    """Counts collected while filtering a chunk stream."""
+
+    def __init__(self):
+        self.total = 0
+        self.removed = 0
+        self.candidates = 0
+
+    @property
+    def kept(self) -> int:
+        return self.total - self.removed
+
+    @property
+    def removed_ratio(self) -> float:
+        return self.removed / self.total if self.total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"total": self.total, "kept": self.kept, "removed": self.removed,
+                "removed_ratio": round(self.removed_ratio, 4), "candidates_checked": self.candidates}
+
+    def __str__(self) -> str:
+        return (f"Deduplication removed {self.removed} of {self.total} chunks "
+                f"({self.removed_ratio:.1%}), {self.candidates} candidate pairs checked")
+
+
+class MinHashDeduplicator:
+    """Streaming near-duplicate filter; the first chunk of each near-duplicate group is kept."""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)[:, np.newaxis]
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)[:, np.newaxis]
+        self._base = np.uint64(1_000_003)
+        self.report = DedupReport()
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """Hash every run of shingle_size words with a rolling polynomial over per-word CRC32s."""
+        words = np.array([zlib.crc32(word.encode("utf-8")) for word in text.split()], dtype=np.uint64) % _PRIME
+        k = min(self.shingle_size, len(words))
+        if k == 0:
+            return np.zeros(1, dtype=np.uint64)
+        shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+        for j in range(k):
+            shingles = (shingles * self._base + words[j:len(words) - k + 1 + j]) % _PRIME
+        return np.unique(shingles)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature: the minimum of num_perm universal hashes over the chunk's shingles."""
+        shingles = self._shingles(text)
+        return ((self._a * shingles + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def filter(self, chunks: Iterable) -> Iterator:
+        """Yield chunks that are not near-duplicates of an earlier one.
+
+        Items may be plain strings or chunking.TextChunk tuples; self.report is updated as the stream is consumed.
+        """
+        tables = [dict() for _ in range(self.bands)]
+        kept = np.empty((1024, self.num_perm), dtype=np.uint32)
+        n_kept = 0
+        for chunk in chunks:
+            self.report.total += 1
+            signature = self.signature(getattr(chunk, "text", chunk))
+            keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+            candidates = {tables[band][key] for band, key in enumerate(keys) if key in tables[band]}
+            self.report.candidates += len(candidates)
+            if any(np.mean(kept[c] == signature) >= self.threshold for c in candidates):
+                self.report.removed += 1
+                continue
+
+            if n_kept == len(kept):
+                kept = np.concatenate([kept, np.empty_like(kept)])
+            kept[n_kept] = signature
+            for band, key in enumerate(keys):
+                tables[band].setdefault(key, n_kept)
+            n_kept += 1
+            yield chunk
@@ -0,0 +1,263 @@
+"""
+Incrementally updatable document index on top of TextVectorizer.
+
+Documents are chunked and embedded individually, and their rows are appended to
+a growable embedding matrix. Removing a document only tombstones its rows; the
+matrix is compacted once the dead fraction passes compact_ratio. Updating a
+document re-embeds only the chunks whose text actually changed, so a one-page
+edit costs a handful of encoder calls rather than a full rebuild.
+
+The index loads from and saves to the app's own vector store. A store built
+from website_data.txt opens as one document, SOURCE_DOCUMENT_ID. save()
+writes the configured search index and the BM25 arrays next to the document
+table, copying the stored embeddings instead of re-encoding them. From then on
+TextVectorizer.load_or_build_vector_store serves that store as it is rather
+than rebuilding it from website_data.txt. Running servers pick up the edits on
+their next warm-up:
+
+    python -m utils.document_index add pricing data/pricing.txt
+    python -m utils.document_index update source data/website_data.txt
+    python -m utils.document_index remove pricing
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.lexical_index import BM25Index
+from utils.search_index import SearchIndex
+from utils.vector_store import load_store
+
+# Document id of the chunks of a store built from a single source file by TextVectorizer
+SOURCE_DOCUMENT_ID = "source"
+
+
+class DocumentIndex:
+    """Mutable set of documents with append-only embeddings, tombstones and compaction."""
+
+    def __init__(self, vectorizer, capacity: int = 1024, compact_ratio: float = 0.25):
+        self.vectorizer = vectorizer
+        self.compact_ratio = compact_ratio
+        self._capacity = capacity
+        self._embeddings = None  # allocated on first add, once the embedding width is known
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._chunks: List[Optional[str]] = []
+        self._doc_rows: Dict[str, np.ndarray] = {}
+        self._doc_hashes: Dict[str, str] = {}
+        self._searchable_view = None  # (index, chunks) over the live rows, rebuilt after an edit
+
+    def __len__(self) -> int:
+        """Number of live chunks."""
+        return int(self._alive[:len(self._chunks)].sum())
+
+    @property
+    def document_ids(self) -> List[str]:
+        return list(self._doc_rows)
+
+    def _append(self, chunks: List[str], embeddings: np.ndarray) -> np.ndarray:
+        """Append rows, growing the matrix geometrically, and return their row numbers."""
+        start, end = len(self._chunks), len(self._chunks) + len(chunks)
+        if not len(chunks):
+            return np.arange(start, end)  # e.g. an empty document; the width is still unknown
+        if self._embeddings is None:
+            self._embeddings = np.empty((self._capacity, embeddings.shape[1]), dtype=np.float32)
+        if end > len(self._embeddings):
+            capacity = max(end, 2 * len(self._embeddings))
+            grown = np.empty((capacity, self._embeddings.shape[1]), dtype=np.float32)
+            grown[:start] = self._embeddings[:start]
+            self._embeddings = grown
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._embeddings[start:end] = embeddings
+        self._alive[start:end] = True
+        self._chunks.extend(chunks)
+        self._searchable_view = None
+        return np.arange(start, end)
+
+    def _embed(self, chunks: List[str]) -> np.ndarray:
+        if not chunks:
+            return np.empty((0, self.vectorizer.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return self.vectorizer.embed_chunks(chunks)
+
+    def add_documents(self, documents: Dict[str, str]) -> int:
+        """Chunk and embed new documents in one encoder batch; returns the number of chunks added."""
+        existing = [doc_id for doc_id in documents if doc_id in self._doc_rows]
+        if existing:
+            raise ValueError(f"Documents already indexed, use update_document: {existing}")
+
+        doc_chunks = {doc_id: self.vectorizer.get_text_chunks(text) for doc_id, text in documents.items()}
+        all_chunks = [chunk for chunks in doc_chunks.values() for chunk in chunks]
+        embeddings = self._embed(all_chunks)
+
+        start = 0
+        for doc_id, chunks in doc_chunks.items():
+            self._doc_rows[doc_id] = self._append(chunks, embeddings[start:start + len(chunks)])
+            self._doc_hashes[doc_id] = hashlib.sha256(documents[doc_id].encode("utf-8")).hexdigest()
+            start += len(chunks)
+        return len(all_chunks)
+
+    def remove_documents(self, doc_ids: Iterable[str]) -> int:
+        """Tombstone the chunks of the given documents; returns the number of chunks removed."""
+        removed = 0
+        for doc_id in doc_ids:
+            rows = self._doc_rows.pop(doc_id, None)
+            if rows is None:
+                continue
+            self._doc_hashes.pop(doc_id, None)
+            self._alive[rows] = False
+            self._searchable_view = None
+            for row in rows:
+                self._chunks[row] = None
+            removed += len(rows)
+        self._maybe_compact()
+        return removed
+
+    def update_document(self, doc_id: str, text: str) -> int:
+        """Replace a document, re-embedding only chunks not already present; returns chunks encoded."""
+        if doc_id not in self._doc_rows:
+            return self.add_documents({doc_id: text})
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if self._doc_hashes.get(doc_id) == text_hash:
+            return 0
+
+        old_rows = self._doc_rows[doc_id]
+        reusable = {self._chunks[row]: row for row in old_rows}
+        chunks = self.vectorizer.get_text_chunks(text)
+        changed = [chunk for chunk in dict.fromkeys(chunks) if chunk not in reusable]
+        fresh = dict(zip(changed, self._embed(changed)))
+
+        embeddings = np.stack([fresh[c] if c in fresh else self._embeddings[reusable[c]] for c in chunks]) \
+            if chunks else self._embed([])
+        self._alive[old_rows] = False
+        self._searchable_view = None
+        for row in old_rows:
+            self._chunks[row] = None
+        self._doc_rows[doc_id] = self._append(chunks, embeddings)
+        self._doc_hashes[doc_id] = text_hash
+        self._maybe_compact()
+        return len(changed)
+
+    def _maybe_compact(self):
+        used = len(self._chunks)
+        if used and (used - len(self)) / used > self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows, keeping each document's chunks contiguous."""
+        order = [row for rows in self._doc_rows.values() for row in rows]
+        remap = np.full(len(self._chunks), -1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+
+        capacity = max(self._capacity, len(order))
+        if self._embeddings is not None:
+            embeddings = np.empty((capacity, self._embeddings.shape[1]), dtype=np.float32)
+            embeddings[:len(order)] = self._embeddings[order]
+            self._embeddings = embeddings
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(order)] = True
+        self._chunks = [self._chunks[row] for row in order]
+        self._doc_rows = {doc_id: remap[rows] for doc_id, rows in self._doc_rows.items()}
+
+    def _searchable(self) -> Tuple[SearchIndex, List[str]]:
+        """The configured search index (and BM25 index, outside dense mode) over the live rows."""
+        if self._searchable_view is None:
+            rows = np.flatnonzero(self._alive[:len(self._chunks)])
+            index = self.vectorizer.build_index(self._embeddings[rows], normalized=True)
+            chunks = [self._chunks[row] for row in rows]
+            if self.vectorizer.retrieval_mode != 'dense':
+                index.lexical_index = BM25Index.from_chunks(chunks)
+            self._searchable_view = index, chunks
+        return self._searchable_view
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Search live chunks exactly as the app would, returning (chunk, cosine distance) pairs."""
+        if not len(self):
+            return []
+        index, chunks = self._searchable()
+        return self.vectorizer.search(query, index, chunks, k)
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """Store fingerprint: the vectorizer's settings plus a digest of every document's text hash."""
+        digest = hashlib.sha256(json.dumps(sorted(self._doc_hashes.items())).encode("utf-8")).hexdigest()
+        return {"source_sha256": digest, **self.vectorizer.settings_fingerprint()}
+
+    def save(self, path: str):
+        """Compact and write the index as a servable vector store, with document row ranges in the manifest."""
+        self.compact()
+        used = len(self._chunks)
+        embeddings = self._embeddings[:used] if self._embeddings is not None else self._embed([])
+        documents = {doc_id: [int(rows[0]), int(rows[-1]) + 1] if len(rows) else [0, 0]
+                     for doc_id, rows in self._doc_rows.items()}
+        index = self.vectorizer.build_index(embeddings, normalized=True)
+        self.vectorizer.save_vector_store(path, index, self._chunks, embeddings, self.fingerprint(), metadata={
+            "documents": documents,
+            "document_hashes": self._doc_hashes,
+        })
+
+    @classmethod
+    def load(cls, vectorizer, path: str, compact_ratio: float = 0.25) -> "DocumentIndex":
+        """Load a saved index, or a store built by TextVectorizer, into memory so it can be modified."""
+        chunks, embeddings, manifest = load_store(path)
+        fingerprint = manifest.get("fingerprint") or {}
+        stored = {key: value for key, value in fingerprint.items() if key != "source_sha256"}
+        if stored and stored != vectorizer.settings_fingerprint():
+            raise ValueError(f"The store at {path} was built with different retrieval settings ({stored})")
+        index = cls(vectorizer, capacity=max(1024, len(chunks)), compact_ratio=compact_ratio)
+        if len(chunks):
+            index._append(list(chunks), np.asarray(embeddings))
+        documents = manifest.get("documents")
+        if documents is None:
+            # Built from one source file: all of it is one document, hashed like update_document() would
+            documents = {SOURCE_DOCUMENT_ID: [0, len(chunks)]}
+            index._doc_hashes = {SOURCE_DOCUMENT_ID: fingerprint.get("source_sha256")}
+        else:
+            index._doc_hashes = dict(manifest.get("document_hashes", {}))
+        index._doc_rows = {doc_id: np.arange(start, end) for doc_id, (start, end) in documents.items()}
+        return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add, update or remove documents in the served vector store.")
+    parser.add_argument("--store", default="data/vector_store", help="vector store directory the app serves")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("add", "update"):
+        command = commands.add_parser(name)
+        command.add_argument("doc_id")
+        command.add_argument("path", help="UTF-8 text file with the document's content")
+    commands.add_parser("remove").add_argument("doc_ids", nargs="+")
+    commands.add_parser("list")
+    args = parser.parse_args()
+
+    from utils.vectorizer import TextVectorizer, read_retrieval_config, vectorizer_options
+
+    # Same settings as the app, so the saved store is served without a rebuild
+    vectorizer = TextVectorizer(**vectorizer_options(read_retrieval_config()))
+    try:
+        index = DocumentIndex.load(vectorizer, args.store)
+    except FileNotFoundError:
+        if args.command != "add":
+            sys.exit(f"No vector store at {args.store}")
+        index = DocumentIndex(vectorizer)
+
+    if args.command == "list":
+        for doc_id, rows in index._doc_rows.items():
+            print(f"{doc_id}: {len(rows)} chunks")
+        return
+    if args.command == "remove":
+        print(f"Removed {index.remove_documents(args.doc_ids)} chunks")
+    else:
+        with open(args.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if args.command == "add":
+            print(f"Embedded {index.add_documents({args.doc_id: text})} chunks")
+        else:
+            print(f"Embedded {index.update_document(args.doc_id, text)} changed chunks")
+    index.save(args.store)
+    print(f"Saved {len(index)} chunks to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
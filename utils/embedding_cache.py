@@ -0,0 +1,161 @@
+"""
+Persistent content-addressed cache of chunk embeddings.
+
+Each entry is keyed by a 16-byte BLAKE2b digest of (model name, chunk text), so a
+re-crawl that leaves most pages unchanged only runs the encoder on new or edited
+chunks. The cache is a directory of three .npy arrays (digests, float32 vectors,
+last-used ticks) plus a small JSON meta file, each replaced atomically on
+flush(); when it grows past max_entries the least recently used entries are
+evicted. A crash between two of those replaces leaves files from different
+flushes, so _load() checks that they agree and otherwise starts empty.
+
+Nothing is read until the first lookup, and flush() drops the entries from
+memory again, so the cache only occupies the heap while a store is being
+(re)built. A server whose store is already up to date never loads it.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+KEYS_FILE = "keys.npy"
+VECTORS_FILE = "vectors.npy"
+TICKS_FILE = "last_used.npy"
+META_FILE = "cache.json"
+
+
+class EmbeddingCache:
+    """Map from hash(model name, chunk text) to embedding, persisted to a directory."""
+
+    def __init__(self, path: str, model_name: str, max_entries: int = 1_000_000):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._release()
+
+    def _release(self):
+        """Forget every entry held in memory; the next lookup reads the directory again."""
+        self._rows: Dict[bytes, int] = {}
+        self._keys: List[bytes] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._new_vectors: List[np.ndarray] = []
+        self._ticks = np.zeros(0, dtype=np.int64)
+        self._new_ticks: List[int] = []
+        self._clock = 0
+        self._dirty = False
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            keys = np.load(os.path.join(self.path, KEYS_FILE))
+            vectors = np.load(os.path.join(self.path, VECTORS_FILE))
+            ticks = np.load(os.path.join(self.path, TICKS_FILE))
+        except (OSError, ValueError):
+            return  # No usable cache yet; start empty
+        count = meta.get("count")
+        if (keys.ndim != 2 or keys.shape[1] != 16 or vectors.ndim != 2 or ticks.ndim != 1
+                or not len(keys) == len(vectors) == len(ticks) == count):
+            return  # Files from different flushes (e.g. a crash mid-flush); rebuild rather than misalign
+        self._vectors, self._ticks = vectors, ticks
+        self._keys = [row.tobytes() for row in keys]
+        self._rows = {key: i for i, key in enumerate(self._keys)}
+        self._clock = int(meta.get("clock", 0))
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._keys)
+
+    def _vector(self, row: int) -> np.ndarray:
+        if row < len(self._vectors):
+            return self._vectors[row]
+        return self._new_vectors[row - len(self._vectors)]
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Return (vector or None per text, positions of the misses)."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            self._ensure_loaded()
+            self._clock += 1
+            found, missing = [], []
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    found.append(None)
+                    missing.append(i)
+                    continue
+                found.append(self._vector(row))
+                if row < len(self._ticks):
+                    self._ticks[row] = self._clock
+                else:
+                    self._new_ticks[row - len(self._ticks)] = self._clock
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            self._dirty = self._dirty or len(missing) < len(texts)
+            return found, missing
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray):
+        with self._lock:
+            self._ensure_loaded()
+            for text, vector in zip(texts, np.asarray(vectors, dtype=np.float32)):
+                key = self.key(text)
+                if key in self._rows:
+                    continue
+                self._rows[key] = len(self._keys)
+                self._keys.append(key)
+                self._new_vectors.append(vector.copy())
+                self._new_ticks.append(self._clock)
+                self._dirty = True
+
+    def flush(self):
+        """Merge new entries, evict least recently used ones past max_entries, write the cache and release it."""
+        with self._lock:
+            if not self._dirty:
+                self._release()
+                return
+            if self._new_vectors:
+                new = np.stack(self._new_vectors)
+                self._vectors = new if not len(self._vectors) else np.concatenate([self._vectors, new])
+                self._ticks = np.concatenate([self._ticks, np.array(self._new_ticks, dtype=np.int64)])
+                self._new_vectors, self._new_ticks = [], []
+
+            if len(self._keys) > self.max_entries:
+                keep = np.sort(np.argsort(-self._ticks, kind="stable")[:self.max_entries])
+                self._keys = [self._keys[i] for i in keep]
+                self._vectors = self._vectors[keep]
+                self._ticks = self._ticks[keep]
+                self._rows = {key: i for i, key in enumerate(self._keys)}
+
+            os.makedirs(self.path, exist_ok=True)
+            keys = np.frombuffer(b"".join(self._keys), dtype=np.uint8).reshape(-1, 16)
+            for name, array in ((KEYS_FILE, keys), (VECTORS_FILE, self._vectors), (TICKS_FILE, self._ticks)):
+                tmp_file = os.path.join(self.path, name + ".tmp.npy")
+                np.save(tmp_file, array)
+                os.replace(tmp_file, os.path.join(self.path, name))
+            tmp_file = os.path.join(self.path, META_FILE + ".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "count": len(self._keys), "clock": self._clock}, f)
+            os.replace(tmp_file, os.path.join(self.path, META_FILE))
+            self._release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._ensure_loaded()
+            return {"entries": len(self._keys), "hits": self.hits, "misses": self.misses}
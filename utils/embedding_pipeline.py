@@ -0,0 +1,172 @@
+"""
+Batched embedding pipeline for ingestion.
+
+Chunks are sorted by length so every batch holds similarly sized texts and
+wastes little compute on padding, then encoded batch by batch straight into a
+preallocated float32 matrix (optionally a memory-mapped .npy file). With
+num_workers > 0 the batches are spread over a pool of processes, each holding
+its own copy of the model, with a bounded number of batches in flight so peak
+memory does not grow with corpus size.
+"""
+
+import os
+import time
+import multiprocessing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache
+from utils.encoder_backends import load_encoder
+from utils.search_index import normalize_rows
+
+_worker_model = None
+
+
+def _init_worker(backend: str, model_name: str, options: Dict[str, Any], threads: int):
+    """Load a private model copy in each worker process."""
+    global _worker_model
+    _worker_model = load_encoder(backend, model_name, {**options, "threads": threads})
+
+
+def _encode_in_worker(batch: Tuple[np.ndarray, List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    rows, texts = batch
+    return rows, np.asarray(_worker_model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+
+class EmbeddingPipeline:
+    """Length-sorted, batched and optionally multi-process chunk encoder."""
+
+    def __init__(self, model, model_name: str, batch_size: int = 64, num_workers: int = 0,
+                 sort_by_length: bool = True, progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                 cache: Optional[EmbeddingCache] = None, backend: str = "torch",
+                 backend_options: Optional[Dict[str, Any]] = None):
+        self.model = model
+        # Workers load their own copy of the same encoder backend
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        self.cache = cache  # chunks found here skip the encoder
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.sort_by_length = sort_by_length
+        self.progress_callback = progress_callback
+        self.last_throughput = 0.0  # chunks/second of the most recent encode()
+
+    def _batches(self, chunks: Sequence[str]):
+        """Yield (row numbers, texts) batches, longest texts first when sorting."""
+        if self.sort_by_length:
+            order = np.argsort([-len(chunk) for chunk in chunks], kind="stable")
+        else:
+            order = np.arange(len(chunks))
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            yield rows, [chunks[row] for row in rows]
+
+    def _allocate(self, n: int, dim: int, mmap_path: Optional[str]) -> np.ndarray:
+        if mmap_path:
+            os.makedirs(os.path.dirname(mmap_path) or ".", exist_ok=True)
+            return np.lib.format.open_memmap(mmap_path, mode="w+", dtype=np.float32, shape=(n, dim))
+        return np.empty((n, dim), dtype=np.float32)
+
+    def encode(self, chunks: Sequence[str], out: Optional[np.ndarray] = None,
+               mmap_path: Optional[str] = None) -> np.ndarray:
+        """Encode chunks into unit-norm float32 rows, in input order."""
+        if out is None:
+            out = self._allocate(len(chunks), self.model.get_sentence_embedding_dimension(), mmap_path)
+        if not len(chunks):
+            return out
+
+        started = time.perf_counter()
+        pool = self._open_pool()
+        try:
+            self._encode_into(chunks, out, pool, 0, len(chunks))
+        finally:
+            if pool is not None:
+                pool.terminate()
+            if self.cache is not None:
+                self.cache.flush()
+        if isinstance(out, np.memmap):
+            out.flush()
+        self.last_throughput = len(chunks) / max(time.perf_counter() - started, 1e-9)
+        return out
+
+    def encode_stream(self, chunks: Iterable, window: Optional[int] = None) -> Iterator[Tuple[List, np.ndarray]]:
+        """Encode a chunk stream window by window, yielding (chunks, unit-norm vectors) in input order.
+
+        Items may be plain strings or chunking.TextChunk tuples. Only one window of
+        chunks is held at a time; length sorting happens within each window.
+        """
+        window = window or self.batch_size * max(16, 4 * self.num_workers)
+        started = time.perf_counter()
+        done = 0
+        pool = self._open_pool()
+        try:
+            buffer = []
+            for chunk in chunks:
+                buffer.append(chunk)
+                if len(buffer) == window:
+                    yield buffer, self._encode_window(buffer, pool, done)
+                    done += len(buffer)
+                    buffer = []
+            if buffer:
+                yield buffer, self._encode_window(buffer, pool, done)
+                done += len(buffer)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            if self.cache is not None:
+                self.cache.flush()
+        self.last_throughput = done / max(time.perf_counter() - started, 1e-9)
+
+    def _encode_window(self, items: List, pool, done: int) -> np.ndarray:
+        texts = [getattr(item, "text", item) for item in items]
+        out = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        self._encode_into(texts, out, pool, done, None)
+        return out
+
+    def _encode_into(self, chunks: Sequence[str], out: np.ndarray, pool, done: int, total: Optional[int]):
+        targets = None
+        if self.cache is not None:
+            cached, missing = self.cache.get_many(chunks)
+            for row, vector in enumerate(cached):
+                if vector is not None:
+                    out[row] = vector
+            done += len(chunks) - len(missing)
+            # Only cache misses go to the encoder; targets maps their positions back into out
+            targets = np.array(missing, dtype=np.int64)
+            chunks = [chunks[row] for row in missing]
+
+        for rows, vectors in self._run(chunks, pool):
+            vectors = normalize_rows(vectors)
+            out[rows if targets is None else targets[rows]] = vectors
+            if self.cache is not None:
+                self.cache.put_many([chunks[row] for row in rows], vectors)
+            done += len(rows)
+            if self.progress_callback:
+                self.progress_callback(done, total)
+
+    def _open_pool(self):
+        """Start the worker pool, or return None to encode in-process."""
+        if self.num_workers <= 0:
+            return None
+        # Spawned workers avoid forking a process that already holds torch thread pools
+        threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        context = multiprocessing.get_context("spawn")
+        return context.Pool(self.num_workers, initializer=_init_worker,
+                            initargs=(self.backend, self.model_name, self.backend_options, threads))
+
+    def _run(self, chunks: Sequence[str], pool):
+        if pool is None:
+            for rows, texts in self._batches(chunks):
+                yield rows, np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+            return
+
+        pending = []
+        for batch in self._batches(chunks):
+            pending.append(pool.apply_async(_encode_in_worker, (batch,)))
+            # Keep only a couple of batches per worker in flight to bound memory
+            while len(pending) >= 2 * self.num_workers:
+                yield pending.pop(0).get()
+        for result in pending:
+            yield result.get()
@@ -0,0 +1,175 @@
+"""
+Pluggable CPU backends for the sentence encoder.
+
+Every backend exposes the small part of the SentenceTransformer API that
+TextVectorizer and EmbeddingPipeline use (encode, tokenizer, max_seq_length,
+get_sentence_embedding_dimension), so they can be swapped by name:
+
+- "torch": the reference float32 SentenceTransformer;
+- "torch-int8": the same model with its Linear layers dynamically quantized to
+  int8 (torch.quantization.quantize_dynamic), no extra dependency;
+- "onnx": the transformer exported once to ONNX and run by ONNX Runtime,
+  dynamically quantized to int8 by default; needs onnxruntime installed.
+
+Heavy imports happen when a backend is constructed, not when this module is
+imported.
+"""
+
+import os
+import re
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.search_index import normalize_rows
+
+
+def _load_sentence_transformer(model_name: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(f"sentence-transformers is required: {e}")
+    return SentenceTransformer(model_name)
+
+
+class EncoderBackend:
+    """Sentence encoder returning float32 embeddings."""
+
+    name = None
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.max_seq_length = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        raise NotImplementedError
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(EncoderBackend):
+    """Reference float32 PyTorch model."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        super().__init__(model_name)
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = _load_sentence_transformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, **kwargs)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class Int8TorchBackend(TorchBackend):
+    """PyTorch model with int8 weights in every Linear layer, activations quantized on the fly."""
+
+    name = "torch-int8"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        super().__init__(model_name, threads)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class OnnxBackend(EncoderBackend):
+    """Transformer exported to ONNX (cached under cache_dir) with pooling and normalization done in numpy."""
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, quantize: bool = True,
+                 cache_dir: str = os.path.join("data", "onnx")):
+        super().__init__(model_name)
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(f"onnxruntime is required for the 'onnx' encoder backend: {e}")
+        reference = _load_sentence_transformer(model_name)
+        transformer, pooling = reference[0], reference[1]
+        self.tokenizer = transformer.tokenizer
+        self.max_seq_length = reference.max_seq_length
+        self.dimension = reference.get_sentence_embedding_dimension()
+        if getattr(pooling, "pooling_mode_mean_tokens", False):
+            self.pooling = "mean"
+        elif getattr(pooling, "pooling_mode_cls_token", False):
+            self.pooling = "cls"
+        else:
+            raise ValueError(f"Unsupported pooling for the 'onnx' encoder backend: {pooling}")
+        self.normalize = any(type(module).__name__ == "Normalize" for module in reference)
+
+        path = self._export(transformer.auto_model, cache_dir, quantize)
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+
+    def _export(self, model, cache_dir: str, quantize: bool) -> str:
+        """Export the transformer once (and its int8 variant), reusing earlier exports."""
+        slug = re.sub(r"[^\w.-]+", "_", self.model_name)
+        path = os.path.join(cache_dir, f"{slug}.onnx")
+        if not os.path.exists(path):
+            import torch
+            os.makedirs(cache_dir, exist_ok=True)
+            sample = self.tokenizer(["warm up"], return_tensors="pt")
+            names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            axes = {name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]}
+            tmp_path = path + ".tmp"
+            model.eval()
+            with torch.no_grad():
+                torch.onnx.export(model, tuple(sample[name] for name in names), tmp_path, input_names=names,
+                                  output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14)
+            os.replace(tmp_path, path)
+        if not quantize:
+            return path
+
+        quantized_path = os.path.join(cache_dir, f"{slug}-int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized_path + ".tmp"
+            quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            features = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                      max_length=self.max_seq_length, return_tensors="np")
+            hidden = self.session.run(None, {name: features[name].astype(np.int64) for name in self.input_names})[0]
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = features["attention_mask"][:, :, np.newaxis].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            out[start:start + len(pooled)] = pooled
+        return normalize_rows(out) if self.normalize else out
+
+
+# Encoder backends selectable through TextVectorizer(encoder=...)
+ENCODER_BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    Int8TorchBackend.name: Int8TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def load_encoder(backend: str, model_name: str, options: Optional[Dict[str, Any]] = None) -> EncoderBackend:
+    """Construct the named encoder backend."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {sorted(ENCODER_BACKENDS)}")
+    return ENCODER_BACKENDS[backend](model_name, **(options or {}))
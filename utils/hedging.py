@@ -0,0 +1,201 @@
+"""
+Hedged requests over an ordered list of models.
+
+The primary model gets the request first. If it has not produced its first
+token within the hedge delay, the next model is raced against it; the first
+attempt to yield a token wins and the others are cancelled. A model that fails
+outright hands over to the next one immediately. Each model keeps a histogram
+of its time to first token, and its hedge delay follows that histogram's p95,
+so hedging only fires on genuinely slow requests and adapts as routes
+speed up or slow down.
+"""
+
+import time
+import queue
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram whose counts decay by half every decay_every observations."""
+
+    def __init__(self, min_seconds: float = 0.05, max_seconds: float = 120.0, buckets: int = 40,
+                 decay_every: int = 200):
+        self.bounds = list(np.geomspace(min_seconds, max_seconds, buckets))
+        self.decay_every = decay_every
+        self._counts = np.zeros(buckets + 1)  # last bucket collects everything above max_seconds
+        self._since_decay = 0
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._counts[bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            self._since_decay += 1
+            if self._since_decay >= self.decay_every:
+                self._counts *= 0.5  # recent requests weigh more than old ones
+                self._since_decay = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, or None without observations."""
+        with self._lock:
+            total = self._counts.sum()
+            if not total:
+                return None
+            bucket = int(np.searchsorted(np.cumsum(self._counts), q * total))
+        return self.bounds[min(bucket, len(self.bounds) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+
+class HedgePolicy:
+    """Per-model first-token latency histograms and the hedge delays derived from them."""
+
+    def __init__(self, quantile: float = 0.95, default_delay: float = 3.0, min_delay: float = 0.5,
+                 max_delay: float = 15.0, min_samples: int = 20, fixed_delay: Optional[float] = None):
+        self.quantile = quantile
+        self.default_delay = default_delay  # used until a model has min_samples observations
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.fixed_delay = fixed_delay  # overrides the adaptive delay when set
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.hedges_total = 0
+        self.hedge_wins = 0  # races won by a model other than the primary
+
+    def histogram(self, model: str) -> LatencyHistogram:
+        with self._lock:
+            return self.histograms.setdefault(model, LatencyHistogram())
+
+    def delay(self, model: str) -> float:
+        """How long to wait for model's first token before hedging to the next model."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        histogram = self.histogram(model)
+        if histogram.count < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, histogram.quantile(self.quantile)))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "hedges_total": self.hedges_total,
+            "hedge_wins": self.hedge_wins,
+            "models": {model: {**histogram.snapshot(), "hedge_delay": self.delay(model)}
+                       for model, histogram in list(self.histograms.items())},
+        }
+
+
+class Attempt:
+    """One model's request in a race; run() registers callbacks that abort it on cancel()."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+_TOKEN, _DONE, _ERROR = "token", "done", "error"
+
+
+def hedged_stream(models: List[str], run: Callable[[str, Attempt], Iterator[str]], policy: HedgePolicy,
+                  hedge: bool = True, final: Callable[[Exception], bool] = None) -> Iterator[str]:
+    """Race run(model, attempt) across models and yield the winning attempt's pieces.
+
+    run must return an iterator of text pieces; it runs in its own thread and should
+    register a way to abort its request through attempt.on_cancel(). An error for which
+    final(error) is true (e.g. a bad API key) ends the race at once instead of falling back.
+    """
+    events = queue.Queue()
+    attempts: List[Attempt] = []
+
+    def worker(attempt: Attempt):
+        try:
+            for piece in run(attempt.model, attempt):
+                if attempt.cancelled.is_set():
+                    return
+                events.put((attempt, _TOKEN, piece))
+            events.put((attempt, _DONE, None))
+        except Exception as e:
+            if not attempt.cancelled.is_set():
+                events.put((attempt, _ERROR, e))
+
+    def launch():
+        attempt = Attempt(models[len(attempts)])
+        attempts.append(attempt)
+        threading.Thread(target=worker, args=(attempt,), name=f"llm-{attempt.model}", daemon=True).start()
+        return time.monotonic() + policy.delay(attempt.model)
+
+    hedge_at = launch()
+    failed = []
+    winner, first = None, None
+    while winner is None:
+        can_hedge = hedge and len(attempts) < len(models)
+        try:
+            attempt, kind, value = events.get(timeout=max(0.0, hedge_at - time.monotonic()) if can_hedge else None)
+        except queue.Empty:
+            policy.hedges_total += 1
+            hedge_at = launch()
+            continue
+        if kind == _ERROR:
+            if final is not None and final(value):
+                for other in attempts:
+                    other.cancel()
+                raise value  # no other model can do better
+            failed.append((attempt, value))
+            if len(failed) == len(attempts):
+                if len(attempts) == len(models):
+                    raise failed[0][1]  # every model failed: report the primary's error
+                hedge_at = launch()  # fall back to the next model straight away
+            continue
+        winner, first = attempt, value
+
+    policy.histogram(winner.model).observe(time.monotonic() - winner.started)
+    if winner is not attempts[0]:
+        policy.hedge_wins += 1
+    for attempt in attempts:
+        if attempt is not winner and attempt not in (a for a, _ in failed):
+            # Censored sample: the loser took at least this long to its first token
+            policy.histogram(attempt.model).observe(time.monotonic() - attempt.started)
+            attempt.cancel()
+
+    if first is None:  # the winner finished without producing any text
+        return
+    yield first
+    try:
+        while True:
+            attempt, kind, value = events.get()
+            if attempt is not winner:
+                continue
+            if kind == _TOKEN:
+                yield value
+            elif kind == _DONE:
+                return
+            else:
+                raise value
+    finally:
+        winner.cancel()  # stop the worker if the consumer abandons the stream early
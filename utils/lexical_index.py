@@ -0,0 +1,134 @@
+"""
+BM25 inverted index over the vector store's chunks.
+
+Exact tokens such as product names, phone numbers and service names are matched
+poorly by MiniLM embeddings alone. BM25Index is built from the same chunks as
+the vector store and persisted next to it as CSR postings: term_offsets indexes
+into int32 chunk ids and uint16 term frequencies, so it memory-maps like the
+rest of the store. TextVectorizer.search uses it for reciprocal rank fusion or
+as a prefilter that restricts dense scoring to lexical candidates.
+"""
+
+import re
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.search_index import top_k
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.casefold())
+
+
+class BM25Builder:
+    """Accumulates postings chunk by chunk, so the index can be built while the store is streamed."""
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self._term_ids = array("i")
+        self._doc_ids = array("i")
+        self._tfs = array("H")
+        self._doc_lengths = array("f")
+
+    def add(self, text: str):
+        tokens = tokenize(text)
+        doc_id = len(self._doc_lengths)
+        for term, tf in Counter(tokens).items():
+            self._term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+            self._doc_ids.append(doc_id)
+            self._tfs.append(min(tf, 65535))
+        self._doc_lengths.append(len(tokens))
+
+    def build(self, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        term_ids = np.frombuffer(self._term_ids, dtype=np.int32)
+        # Stable sort groups postings by term while keeping chunk ids ascending within each term
+        order = np.argsort(term_ids, kind="stable")
+        term_offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=term_offsets[1:])
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return BM25Index(terms, term_offsets,
+                         np.frombuffer(self._doc_ids, dtype=np.int32)[order],
+                         np.frombuffer(self._tfs, dtype=np.uint16)[order],
+                         np.frombuffer(self._doc_lengths, dtype=np.float32).copy(), k1, b)
+
+
+class BM25Index:
+    """Okapi BM25 over CSR postings."""
+
+    def __init__(self, terms: List[str], term_offsets: np.ndarray, postings: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        df = np.diff(term_offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def from_chunks(cls, chunks, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        builder = BM25Builder()
+        for chunk in chunks:
+            builder.add(chunk)
+        return builder.build(k1, b)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def params(self) -> Dict[str, Any]:
+        return {"k1": self.k1, "b": self.b}
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        vocab_blob = np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8)
+        return {
+            "bm25_vocab": vocab_blob,
+            "bm25_term_offsets": self.term_offsets,
+            "bm25_postings": self.postings,
+            "bm25_tfs": self.tfs,
+            "bm25_doc_lengths": self.doc_lengths,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocab = arrays["bm25_vocab"].tobytes().decode("utf-8")
+        terms = vocab.split("\n") if vocab else []
+        return cls(terms, arrays["bm25_term_offsets"], arrays["bm25_postings"], arrays["bm25_tfs"],
+                   arrays["bm25_doc_lengths"], k1, b)
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (chunk ids, BM25 scores) for every chunk matching at least one query term."""
+        term_ids = sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary})
+        if not term_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        docs, contributions = [], []
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            ids = np.asarray(self.postings[start:end])
+            tf = np.asarray(self.tfs[start:end], dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[ids] / max(self.avg_length, 1e-9))
+            docs.append(ids)
+            contributions.append(self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm))
+
+        docs = np.concatenate(docs)
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+        return unique_docs.astype(np.int64), totals
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k (chunk ids, scores) by BM25, best first."""
+        ids, totals = self.scores(query)
+        if not len(ids):
+            return ids, totals
+        best, best_scores = top_k(totals[np.newaxis, :], k)
+        return ids[best[0]], best_scores[0]
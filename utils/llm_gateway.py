@@ -0,0 +1,327 @@
+"""
+Process-wide gateway in front of the shared RAGLLM.
+
+Every Streamlit session submits its LLM calls here instead of calling the API
+from its own script thread. A bounded pool of workers serves the calls, a
+token bucket keeps the request rate under the plan's limit, and sessions are
+served round-robin so one user's burst cannot starve everyone else. The bucket
+is installed as the client's rate_limiter, so it is charged once per upstream
+request: a call that retries or hedges across models takes a token for every
+request it actually sends, not one for the whole call. A call that
+would wait in the queue longer than max_wait is rejected up front with
+GatewayBusyError, so users see a quick "busy" message instead of a long spinner
+that ends in a 429. Identical questions asked at the same time against the same
+retrieved context share one upstream call (see utils.single_flight), and with a
+ResponseCache (and a SemanticCache for paraphrases) repeated questions are answered
+without queueing at all.
+"""
+
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.hedging import LatencyHistogram
+from utils.rag_llm import RAGLLM
+from utils.response_cache import ResponseCache
+from utils.semantic_cache import SemanticCache
+from utils.resilience import LLMError
+from utils.single_flight import SingleFlight, request_key
+
+
+class GatewayBusyError(LLMError):
+    """Raised instead of queueing a call that could not start within the gateway's max_wait."""
+
+    retryable = False
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def time_until(self, n: float = 1.0) -> float:
+        """Seconds until n tokens are available, ignoring other callers."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (n - self._tokens) / self.rate)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting for it up to timeout seconds; False if it did not arrive in time."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+_RESULT, _TOKEN, _DONE, _ERROR = "result", "token", "done", "error"
+
+
+class _Job:
+    def __init__(self, session_id: str, run: Callable[[], Any], stream: bool):
+        self.session_id = session_id
+        self.run = run
+        self.stream = stream
+        self.enqueued = time.monotonic()
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()  # set when a streaming caller stops reading
+
+
+class LLMGateway:
+    """Bounded worker pool, rate limit and per-session fair queuing around one RAGLLM.
+
+    Mirrors RAGLLM's generate_response / generate_response_stream, with an extra session_id
+    used for fair queuing; metrics() adds a "gateway" section to the client's metrics.
+    """
+
+    def __init__(self, llm: RAGLLM, workers: int = 4, requests_per_minute: float = 60.0, burst: int = 10,
+                 max_wait: float = 15.0, max_queue: int = 64, coalesce: bool = True,
+                 cache: Optional[ResponseCache] = None, semantic_cache: Optional[SemanticCache] = None):
+        self.llm = llm
+        self.workers = workers  # keep at or below the client's pool_size so workers never wait for a connection
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        llm.rate_limiter = self.bucket  # charged per upstream request, retries and hedges included
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.single_flight = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()  # session id -> its pending jobs, in turn order
+        self._depth = 0
+        self._active = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._service_time = 2.0  # moving average of seconds a worker spends per call
+        self.wait_histogram = LatencyHistogram(min_seconds=0.001)
+        self.submitted_total = 0
+        self.completed_total = 0
+        self.shed_total = 0
+        self._threads = [threading.Thread(target=self._worker, name=f"llm-gateway-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Stop the workers once the calls already queued have been served."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def estimated_wait(self, session_id: str = None) -> float:
+        """Seconds a call submitted now by session_id would wait before a worker starts it."""
+        with self._cond:
+            # Round-robin position: the session's own backlog, plus up to one more job than that
+            # from every other session, since each gets a turn before this call's
+            own = len(self._queues.get(session_id, ()))
+            position = own + sum(min(len(jobs), own + 1) for key, jobs in self._queues.items() if key != session_id)
+            busy_slots = position + self._active
+            service_time = self._service_time
+        # Enough workers free: only the rate limit can hold it back
+        slots_wait = max(0, busy_slots - self.workers + 1) / self.workers * service_time
+        rate_wait = self.bucket.time_until(position + 1)
+        return max(slots_wait, rate_wait)
+
+    def _busy(self, reason: str) -> GatewayBusyError:
+        with self._cond:
+            self.shed_total += 1
+        return GatewayBusyError(f"JivaBot is busy answering other questions ({reason}). "
+                                f"Please try again in a few seconds.")
+
+    def _submit(self, session_id: str, run: Callable[[], Any], stream: bool) -> _Job:
+        session_id = session_id or "anonymous"
+        if self.estimated_wait(session_id) > self.max_wait:
+            raise self._busy("queue wait too long")
+        job = _Job(session_id, run, stream)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("LLM gateway is closed")
+            if self._depth >= self.max_queue:
+                raise self._busy("queue full")
+            self._queues.setdefault(job.session_id, deque()).append(job)
+            self._depth += 1
+            self.submitted_total += 1
+            self._cond.notify()
+        return job
+
+    def _next_job(self) -> Optional[_Job]:
+        """Oldest job of the session whose turn it is; the session then moves to the back of the line."""
+        with self._cond:
+            while not self._queues:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            session_id, jobs = self._queues.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                self._queues[session_id] = jobs
+            self._depth -= 1
+            self._active += 1
+            return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._serve(job)
+            finally:
+                with self._cond:
+                    self._active -= 1
+
+    def _serve(self, job: _Job):
+        remaining = self.max_wait - (time.monotonic() - job.enqueued)
+        if job.cancelled.is_set():
+            return
+        if remaining <= 0:
+            job.events.put((_ERROR, self._busy("queue wait too long")))
+            return
+        # Tokens are taken by the client per request; here we only shed a job the bucket cannot start in time
+        if self.bucket.time_until() > remaining:
+            job.events.put((_ERROR, self._busy("rate limit")))
+            return
+        self.wait_histogram.observe(time.monotonic() - job.enqueued)
+        started = time.monotonic()
+        try:
+            if not job.stream:
+                job.events.put((_RESULT, job.run()))
+            else:
+                stream = job.run()
+                try:
+                    for piece in stream:
+                        if job.cancelled.is_set():
+                            break
+                        job.events.put((_TOKEN, piece))
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        close()
+                job.events.put((_DONE, None))
+        except Exception as e:
+            job.events.put((_ERROR, e))
+        finally:
+            with self._cond:
+                self.completed_total += 1
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+
+    @staticmethod
+    def _drain(job: _Job) -> Iterator[str]:
+        try:
+            while True:
+                kind, value = job.events.get()
+                if kind == _TOKEN:
+                    yield value
+                elif kind == _DONE:
+                    return
+                else:
+                    raise value
+        finally:
+            job.cancelled.set()  # frees the worker if the caller stops reading early
+
+    @staticmethod
+    def _result(job: _Job) -> str:
+        kind, value = job.events.get()
+        if kind == _ERROR:
+            raise value
+        return value
+
+    def generate_response(self, query: str, context_chunks: List[str], session_id: str = None) -> str:
+        """Queue a RAG answer and wait for it; raises GatewayBusyError when the gateway is saturated."""
+        def start():
+            return self._result(self._submit(session_id, lambda: self.llm.generate_response(query, context_chunks),
+                                             stream=False))
+
+        cache_key, vector, cached = self._cached(query, context_chunks)
+        if cached is not None:
+            return cached
+        if self.single_flight is None:
+            answer = start()
+        else:
+            answer = "".join(self.single_flight.stream(request_key(query, context_chunks), lambda: iter([start()])))
+        if cache_key is not None:
+            self.cache.set(cache_key, answer)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(query, context_chunks, answer, vector)
+        return answer
+
+    def generate_response_stream(self, query: str, context_chunks: List[str], session_id: str = None) -> Iterator[str]:
+        """Queue a streamed RAG answer; admission is decided here, before the first token is requested.
+
+        Callers that join an identical in-flight question are not queued: they follow its stream.
+        """
+        def start():
+            return self._drain(self._submit(session_id, lambda: self.llm.generate_response_stream(query, context_chunks),
+                                            stream=True))
+
+        cache_key, vector, cached = self._cached(query, context_chunks)
+        if cached is not None:
+            return iter([cached])
+        if self.single_flight is None:
+            stream = start()
+        else:
+            stream = self.single_flight.stream(request_key(query, context_chunks), start)
+        if self.semantic_cache is not None:
+            stream = self.semantic_cache.record(query, context_chunks, stream, vector)
+        return stream if cache_key is None else self.cache.record(cache_key, stream)
+
+    def _cached(self, query: str, context_chunks: List[str]):
+        """(exact cache key, query embedding, cached answer): the exact cache first, then paraphrases."""
+        cache_key = vector = None
+        if self.cache is not None:
+            cache_key = self.cache.key(query, context_chunks, self.llm.models, self.llm.prompt_version)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cache_key, vector, cached
+        if self.semantic_cache is not None:
+            vector = self.semantic_cache.embed(query)
+            cached = self.semantic_cache.lookup(query, context_chunks, vector)
+            if cached is not None:
+                return cache_key, vector, cached
+        return cache_key, vector, None
+
+    def metrics(self) -> Dict[str, Any]:
+        """The client's metrics plus queue depth, wait times and shedding counts."""
+        with self._cond:
+            gateway = {"queue_depth": self._depth, "sessions_queued": len(self._queues), "active": self._active,
+                       "workers": self.workers, "service_time": self._service_time}
+        gateway.update({
+            "estimated_wait": self.estimated_wait(),
+            "wait_p50": self.wait_histogram.quantile(0.5),
+            "wait_p95": self.wait_histogram.quantile(0.95),
+            "tokens_available": self.bucket.tokens,
+            "submitted_total": self.submitted_total,
+            "completed_total": self.completed_total,
+            "shed_total": self.shed_total,
+        })
+        if self.single_flight is not None:
+            gateway["single_flight"] = self.single_flight.metrics()
+        if self.cache is not None:
+            gateway["response_cache"] = self.cache.metrics()
+        if self.semantic_cache is not None:
+            gateway["semantic_cache"] = self.semantic_cache.metrics()
+        return {**self.llm.metrics(), "gateway": gateway}
@@ -0,0 +1,109 @@
+"""
+Quantized embedding codes with full-precision rescoring.
+
+QuantizedSearchIndex keeps a compact copy of the embeddings in memory, either
+float16 (2x smaller) or per-dimension scaled int8 (4x smaller), and runs the
+first scoring pass over those codes. The best k * rescore candidates are then
+rescored exactly against the float32 matrix, which stays memory-mapped on disk
+so only the candidate rows are ever paged in.
+"""
+
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from utils.search_index import SearchIndex, normalize_rows, top_k
+
+QUANTIZATION_TYPES = ("float16", "int8")
+
+
+def quantize_int8(embeddings: np.ndarray, block: int = 1024) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Encode rows as int8 codes with a per-dimension offset and scale: x ~= offset + scale * (code + 128)."""
+    low = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+    high = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+    for start in range(0, len(embeddings), block):
+        rows = embeddings[start:start + block]
+        low = np.minimum(low, rows.min(axis=0))
+        high = np.maximum(high, rows.max(axis=0))
+    scale = np.maximum(high - low, 1e-12) / 255.0
+
+    codes = np.empty(embeddings.shape, dtype=np.int8)
+    for start in range(0, len(embeddings), block):
+        rows = (embeddings[start:start + block] - low) / scale
+        codes[start:start + len(rows)] = np.clip(np.rint(rows) - 128, -128, 127)
+    return codes, low.astype(np.float32), scale.astype(np.float32)
+
+
+class QuantizedSearchIndex(SearchIndex):
+    """Two-pass search: approximate scores over compact codes, exact rescoring of the top candidates."""
+
+    index_type = "quantized"
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False, quantization: str = "int8",
+                 rescore: int = 10, block: int = 1024):
+        if quantization not in QUANTIZATION_TYPES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_TYPES}")
+        super().__init__(embeddings, normalized)
+        self.quantization = quantization
+        self.rescore = rescore
+        self.block = block
+        if quantization == "float16":
+            self.codes = self.embeddings.astype(np.float16)
+            self.offset = self.scale = None
+        else:
+            self.codes, self.offset, self.scale = quantize_int8(self.embeddings, block)
+
+    def params(self) -> Dict[str, Any]:
+        return {"quantization": self.quantization}
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"quantized_codes": self.codes}
+        if self.quantization == "int8":
+            arrays.update({"quantized_offset": self.offset, "quantized_scale": self.scale})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, embeddings: np.ndarray, arrays: Dict[str, np.ndarray], rescore: int = 10,
+                    block: int = 1024, **build_params) -> "QuantizedSearchIndex":
+        """Restore persisted codes without re-quantizing; build parameters are already baked in."""
+        index = cls.__new__(cls)
+        SearchIndex.__init__(index, embeddings, normalized=True)
+        # Codes are the hot first-pass data, so they are read into memory rather than left mapped
+        index.codes = np.array(arrays["quantized_codes"])
+        index.quantization = "float16" if index.codes.dtype == np.float16 else "int8"
+        index.offset = np.array(arrays["quantized_offset"]) if "quantized_offset" in arrays else None
+        index.scale = np.array(arrays["quantized_scale"]) if "quantized_scale" in arrays else None
+        index.rescore = rescore
+        index.block = block
+        return index
+
+    def nbytes(self) -> int:
+        """Resident size of the in-memory codes."""
+        return self.codes.nbytes + sum(a.nbytes for a in (self.offset, self.scale) if a is not None)
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Score every row from its codes; constant per-query terms are dropped since only ranking matters."""
+        if self.quantization == "int8":
+            # q . (offset + scale * (code + 128)) ranks the same as (q * scale) . code
+            queries = queries * self.scale
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        # Small row blocks keep each widened float32 copy in cache while it is scored
+        for start in range(0, len(self.codes), self.block):
+            rows = self.codes[start:start + self.block].astype(np.float32)
+            scores[:, start:start + len(rows)] = queries @ rows.T
+        return scores
+
+    def kneighbors(self, query_vectors: np.ndarray, n_neighbors: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        k = min(n_neighbors, len(self.codes))
+        candidates, _ = top_k(self._approximate_scores(queries), k * self.rescore)
+
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for row, (query, ids) in enumerate(zip(queries, candidates)):
+            ids = np.sort(ids)  # ascending ids keep the memory-mapped reads sequential
+            exact = self.embeddings[ids] @ query
+            best, sims = top_k(exact[np.newaxis, :], k)
+            indices[row] = ids[best[0]]
+            distances[row] = 1.0 - sims[0]
+        return distances, indices
@@ -0,0 +1,73 @@
+"""
+Bounded, thread-safe LRU cache of query embeddings.
+
+Users repeat the same short questions constantly, so TextVectorizer keeps the
+encoder output for recent queries. The cache lives on the vectorizer, which is
+shared across Streamlit sessions through the cached load_chatbot resource.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a question for every cache and coalescing key: case-folded with whitespace collapsed.
+
+    Punctuation is kept, since "C++" and "C" are different questions to the encoder and the LLM.
+    """
+    return " ".join(query.casefold().split())
+
+
+class QueryEmbeddingCache:
+    """LRU map from normalized query text to its embedding, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        if self.maxsize <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False  # Shared between sessions, so never mutated in place
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,32 +1,53 @@
 # filepath: c:\Users\aksha\OneDrive\Desktop\jivabot\utils\rag_llm.py
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 import json
+import socket
 import requests
-import time
-from functools import wraps
-
-def retry_with_backoff(retries=3, backoff_in_seconds=1):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            x = 0
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if x == retries:
-                        raise e
-                    sleep = (backoff_in_seconds * 2 ** x)
-                    time.sleep(sleep)
-                    x += 1
-        return wrapper
-    return decorator
-
-class RAGLLM:
-    def __init__(self, api_key: str):
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+from requests.adapters import HTTPAdapter
+
+from utils.hedging import Attempt, HedgePolicy, hedged_stream
+from utils.resilience import (AccountError, CircuitBreaker, FatalError, RateLimitedError, RetryableError,
+                              RetryPolicy, parse_retry_after)
+
+OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+DEFAULT_MODEL = "mistralai/mixtral-8x7b-instruct"
+# Bump whenever build_prompt changes, so cached answers from the old prompt are not reused
+PROMPT_VERSION = "1"
+
+class LLMClientBase:
+    """Prompt, payload, error mapping and per-model resilience shared by RAGLLM and AsyncRAGLLM."""
+
+    def __init__(self, api_key: str, api_url: str = OPENROUTER_API_URL, connect_timeout: float = 5.0,
+                 read_timeout: float = 30.0, retries: int = 3, deadline: float = 45.0, failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0, models: List[str] = None):
+        self.api_url = api_url  # any OpenAI-compatible endpoint, e.g. a local stub for testing
         self.api_key = api_key
+        # Ordered by preference: later models take over when the primary fails (and, in RAGLLM,
+        # are hedged against it when it is slow to start answering)
+        self.models = list(models or [DEFAULT_MODEL])
+        self.model = self.models[0]
+        self.prompt_version = PROMPT_VERSION
+        # (connect, read): fail fast on an unreachable host, allow slow generation between bytes
+        self.timeout = (connect_timeout, read_timeout)
+        # One breaker per model, shared by every request through this instance: a failing model trips
+        # it for all sessions without blocking the other models it is hedged against
+        self.breakers = {model: CircuitBreaker(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout)
+                         for model in self.models}
+        self.retry_policies = {model: RetryPolicy(retries=retries, base_delay=1.0, deadline=deadline,
+                                                  breaker=self.breakers[model])
+                               for model in self.models}
+        self.breaker = self.breakers[self.model]
+        self.retry_policy = self.retry_policies[self.model]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Circuit breaker states and retry count, for the sidebar or monitoring.
+
+        "circuit_breaker" is the primary model's breaker; "circuit_breakers" has every model's.
+        """
+        return {"circuit_breaker": self.breaker.metrics(),
+                "circuit_breakers": {model: breaker.metrics() for model, breaker in self.breakers.items()},
+                "retries_total": sum(policy.retries_total for policy in self.retry_policies.values())}
 
     def build_prompt(self, query: str, context_chunks: List[str]) -> List[Dict[str, str]]:
         """Build a RAG prompt with context."""
@@ -44,61 +65,234 @@ class RAGLLM:
         ]
         return messages
 
-    @retry_with_backoff(retries=3, backoff_in_seconds=1)
-    def get_response(self, messages: List[Dict[str, str]]) -> str:
-        """Get response from OpenRouter API with retry logic."""
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://jivabot.streamlit.app",
             "X-Title": "JivaBot"
         }
-        
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool = False, model: str = None) -> Dict[str, Any]:
         data = {
-            "model": "mistralai/mixtral-8x7b-instruct",
+            "model": model or self.model,
             "messages": messages,
             "max_tokens": 1000,
             "temperature": 0.7
         }
+        if stream:
+            data["stream"] = True
+        return data
+
+    @staticmethod
+    def _status_error(status_code: int, text: str, retry_after: float = None) -> Exception:
+        """User-facing error for a failed API response."""
+        if status_code == 402:
+            return AccountError("API key has insufficient credits or payment is required. Please check your OpenRouter account.")
+        elif status_code == 401:
+            return AccountError("Invalid API key. Please check your OpenRouter API key configuration.")
+        elif status_code == 429:
+            return RateLimitedError("Rate limit exceeded. Please try again in a moment.", retry_after=retry_after)
+        elif status_code == 408 or status_code >= 500:
+            return RetryableError(f"API Error {status_code}: {text}", retry_after=retry_after)
+        return FatalError(f"API Error {status_code}: {text}")
+
+    @staticmethod
+    def _event_content(line: str) -> Optional[str]:
+        """Text carried by one server-sent event line; None for separators, keep-alives, [DONE] and empty deltas."""
+        # Blank lines separate events; lines starting with ':' are keep-alive comments
+        if not line or not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None
+        event = json.loads(data)
+        if "error" in event:
+            error = event["error"]
+            raise RetryableError(f"API Error: {error.get('message', error) if isinstance(error, dict) else error}")
+        if not event.get("choices"):
+            return None
+        return event["choices"][0].get("delta", {}).get("content") or None
+
+    def _request_timeout(self, remaining: float):
+        """(connect, read) timeouts, shortened so one attempt cannot outlive the request deadline."""
+        return tuple(max(0.001, min(timeout, remaining)) for timeout in self.timeout)
+
+
+class RAGLLM(LLMClientBase):
+    def __init__(self, api_key: str, api_url: str = OPENROUTER_API_URL, pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0, keep_alive: bool = True,
+                 retries: int = 3, deadline: float = 45.0, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 models: List[str] = None, hedge: bool = True, hedge_delay: float = None):
+        super().__init__(api_key, api_url, connect_timeout, read_timeout, retries, deadline, failure_threshold,
+                         recovery_timeout, models)
+        self.hedge = hedge
+        # hedge_delay=None follows each model's p95 time to first token
+        self.hedge_policy = HedgePolicy(fixed_delay=hedge_delay)
+        # One pooled session per instance; the app shares the instance across sessions, so
+        # follow-up questions reuse warm TCP + TLS connections instead of handshaking again
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self._headers())
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+        # Optional limiter with acquire(timeout) -> bool, taken before every upstream request (each
+        # retry and each hedge included); LLMGateway installs its token bucket here
+        self.rate_limiter = None
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Circuit breaker states, retry count and hedging stats, for the sidebar or monitoring."""
+        return {**super().metrics(), "hedging": self.hedge_policy.metrics()}
+
+    @classmethod
+    def _check_status(cls, response: requests.Response):
+        """Raise the user-facing error for a failed API response."""
+        if response.status_code >= 400:
+            raise cls._status_error(response.status_code, response.text,
+                                    parse_retry_after(response.headers.get("Retry-After")))
         
+        response.raise_for_status()
+
+    def _acquire_rate_limit(self, remaining: float):
+        """Wait for the rate limiter, if any, before sending one request."""
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=remaining):
+            raise RateLimitedError("Rate limit exceeded. Please try again in a moment.")
+
+    def get_response(self, messages: List[Dict[str, str]]) -> str:
+        """Get response from OpenRouter API with retry logic.
+
+        With several models configured the answer is collected from a hedged stream instead.
+        """
+        if len(self.models) > 1:
+            return "".join(self.stream_response(messages))
+        return self.retry_policy.call(lambda remaining: self._get_response_once(messages, remaining))
+
+    def _get_response_once(self, messages: List[Dict[str, str]], remaining: float) -> str:
+        self._acquire_rate_limit(remaining)
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.api_url,
-                headers=headers,
-                json=data,
-                timeout=30
+                json=self._payload(messages),
+                timeout=self._request_timeout(remaining)
             )
             
-            if response.status_code == 402:
-                raise Exception("API key has insufficient credits or payment is required. Please check your OpenRouter account.")
-            elif response.status_code == 401:
-                raise Exception("Invalid API key. Please check your OpenRouter API key configuration.")
-            elif response.status_code == 429:
-                raise Exception("Rate limit exceeded. Please try again in a moment.")
-            elif response.status_code >= 400:
-                error_msg = f"API Error {response.status_code}: {response.text}"
-                raise Exception(error_msg)
-            
-            response.raise_for_status()
+            self._check_status(response)
             
             result = response.json()
             if "choices" not in result or not result["choices"]:
-                raise Exception("Invalid response format from API")
+                raise FatalError("Invalid response format from API")
                 
             return result["choices"][0]["message"]["content"]
             
         except requests.exceptions.Timeout:
-            raise Exception("API request timed out. Please try again.")
+            raise RetryableError("API request timed out. Please try again.")
         except requests.exceptions.ConnectionError:
-            raise Exception("Failed to connect to API. Please check your internet connection.")
+            raise RetryableError("Failed to connect to API. Please check your internet connection.")
         except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
+            raise RetryableError(f"API request failed: {str(e)}")
+
+    def _open_stream(self, messages: List[Dict[str, str]], model: str = None, retries: int = None) -> requests.Response:
+        """Start a streamed completion; retried like get_response, since nothing has been shown yet.
+
+        retries=0 makes a single attempt, still guarded by the model's circuit breaker.
+        """
+        model = model or self.model
+        return self.retry_policies[model].call(lambda remaining: self._open_stream_once(messages, remaining, model),
+                                               retries=retries)
+
+    def _open_stream_once(self, messages: List[Dict[str, str]], remaining: float, model: str = None) -> requests.Response:
+        self._acquire_rate_limit(remaining)
+        try:
+            response = self.session.post(
+                self.api_url,
+                json=self._payload(messages, stream=True, model=model),
+                timeout=self._request_timeout(remaining),
+                stream=True
+            )
+        except requests.exceptions.Timeout:
+            raise RetryableError("API request timed out. Please try again.")
+        except requests.exceptions.ConnectionError:
+            raise RetryableError("Failed to connect to API. Please check your internet connection.")
+        except requests.exceptions.RequestException as e:
+            raise RetryableError(f"API request failed: {str(e)}")
+        try:
+            self._check_status(response)
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Yield the completion text piece by piece as server-sent events arrive.
+
+        With several models configured, the first to produce a token wins the race (see utils.hedging).
+        """
+        if len(self.models) == 1:
+            return self._stream_model(messages, self.model)
+        return hedged_stream(self.models, lambda model, attempt: self._stream_model(messages, model, attempt),
+                             self.hedge_policy, hedge=self.hedge,
+                             final=lambda error: isinstance(error, AccountError))
+
+    def _stream_model(self, messages: List[Dict[str, str]], model: str, attempt: Attempt = None) -> Iterator[str]:
+        """Stream one model's completion; cancelling attempt closes the response mid-read.
+
+        Inside a hedged race the request is not retried: a failure hands over to the next model at once.
+        """
+        response = self._open_stream(messages, model, retries=0 if attempt is not None else None)
+        breaker = self.breakers[model]
+        if attempt is not None:
+            attempt.on_cancel(lambda: self._abort_response(response))
+        # SSE is UTF-8, but text/event-stream without a charset would otherwise decode as ISO-8859-1
+        response.encoding = "utf-8"
+        try:
+            # Read past [DONE] to the end of the body so the connection goes back to the pool
+            for line in response.iter_lines(decode_unicode=True):
+                content = self._event_content(line)
+                if content:
+                    yield content
+        except Exception as e:
+            if attempt is not None and attempt.cancelled.is_set():
+                return  # we closed the response ourselves after another model won
+            if isinstance(e, requests.exceptions.Timeout):
+                breaker.record_failure()
+                raise RetryableError("API request timed out. Please try again.")
+            if isinstance(e, requests.exceptions.RequestException):
+                breaker.record_failure()
+                raise RetryableError(f"API request failed: {str(e)}")
+            raise
+        finally:
+            response.close()
+
+    @staticmethod
+    def _abort_response(response: requests.Response):
+        """Close a streamed response from another thread.
+
+        Closing alone waits for a read blocked in the streaming thread, so shut the socket down first.
+        """
+        sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
 
     def generate_response(self, query: str, context_chunks: List[str]) -> str:
         """Generate a response using RAG."""
         messages = self.build_prompt(query, context_chunks)
         return self.get_response(messages)
 
+    def generate_response_stream(self, query: str, context_chunks: List[str]) -> Iterator[str]:
+        """Generate a response using RAG, yielding text as it is produced."""
+        messages = self.build_prompt(query, context_chunks)
+        return self.stream_response(messages)
+
 if __name__ == "__main__":
     # Test the module
     import os
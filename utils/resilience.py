@@ -0,0 +1,222 @@
+"""
+Retry policy and circuit breaker for calls to the LLM API.
+
+Errors are split into retryable ones (timeouts, connection failures, 429 and
+5xx responses) and fatal ones (bad key, no credits, malformed requests) that
+no amount of retrying will fix. Retryable errors are retried with full-jitter
+exponential backoff, honouring Retry-After, as long as the request's total
+deadline allows. A CircuitBreaker shared by all requests fails fast while the
+upstream keeps failing, then lets a single probe through after a cool-down.
+A 429 is retried like any other retryable error but does not count towards
+opening the breaker: the upstream is healthy, we are just over our quota.
+"""
+
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class LLMError(Exception):
+    """Error talking to the LLM API; `retryable` says whether trying again can help."""
+
+    retryable = False
+
+
+class RetryableError(LLMError):
+    retryable = True
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds the server asked us to wait, if any
+
+
+class RateLimitedError(RetryableError):
+    """429 Too Many Requests: worth retrying after Retry-After, but not a sign of an unhealthy upstream."""
+
+
+class FatalError(LLMError):
+    retryable = False
+
+
+class AccountError(FatalError):
+    """401/402: the API key or account is the problem, so every model would fail the same way."""
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+    retryable = False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures; half-open probe after recovery_timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Whether a request may go out now; half-open lets exactly one probe through."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED or (state == self.HALF_OPEN and not self._probing):
+                self._probing = state == self.HALF_OPEN
+                return True
+            self.rejected_total += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_total += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a request that says nothing about upstream health: frees a half-open probe, counts nothing."""
+        with self._lock:
+            self._probing = False
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {"state": state, "state_code": self.STATE_CODES[state], "consecutive_failures": self._failures,
+                    "opened_total": self.opened_total, "rejected_total": self.rejected_total}
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff within a total deadline, optionally guarded by a circuit breaker."""
+
+    def __init__(self, retries: int = 3, base_delay: float = 1.0, max_delay: float = 8.0, deadline: float = 45.0,
+                 breaker: Optional[CircuitBreaker] = None, rng: Optional[random.Random] = None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker
+        self._rng = rng or random.Random()
+        self.retries_total = 0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number attempt + 1: uniform in [0, min(max_delay, base * 2**attempt)], at least Retry-After."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def _before_attempt(self, last_error: Optional[Exception]):
+        if self.breaker is not None and not self.breaker.allow():
+            if last_error is not None:
+                raise last_error  # the breaker opened while we were retrying; report the real failure
+            raise CircuitOpenError(f"The AI service is temporarily unavailable after repeated failures. "
+                                   f"Please try again in {self.breaker.retry_in():.0f} seconds.")
+
+    def _after_error(self, error: Exception, attempt: int, started: float, retries: int) -> float:
+        """Record the failure and return the delay before retrying, or re-raise if we should stop."""
+        retryable = getattr(error, "retryable", False)
+        if self.breaker is not None:
+            # A fatal API error is still an answer from a healthy upstream
+            if isinstance(error, FatalError):
+                self.breaker.record_success()
+            elif isinstance(error, RateLimitedError):
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+        if not retryable or attempt >= retries:
+            raise error
+        delay = self.backoff(attempt, getattr(error, "retry_after", None))
+        if time.monotonic() - started + delay >= self.deadline:
+            raise error
+        self.retries_total += 1
+        return delay
+
+    def remaining(self, started: float) -> float:
+        return max(0.0, self.deadline - (time.monotonic() - started))
+
+    def call(self, func: Callable[[float], Any], retries: Optional[int] = None) -> Any:
+        """Run func(remaining seconds) until it succeeds, fails fatally, or retries or deadline run out.
+
+        retries overrides the policy's own count for this call, e.g. 0 for a single guarded attempt.
+        """
+        retries = self.retries if retries is None else retries
+        started = time.monotonic()
+        attempt, last_error = 0, None
+        while True:
+            self._before_attempt(last_error)
+            try:
+                result = func(self.remaining(started))
+            except Exception as error:
+                time.sleep(self._after_error(error, attempt, started, retries))
+                attempt, last_error = attempt + 1, error
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    async def acall(self, func: Callable[[float], Awaitable[Any]], retries: Optional[int] = None) -> Any:
+        """Coroutine version of call()."""
+        retries = self.retries if retries is None else retries
+        started = time.monotonic()
+        attempt, last_error = 0, None
+        while True:
+            self._before_attempt(last_error)
+            try:
+                result = await func(self.remaining(started))
+            except Exception as error:
+                await asyncio.sleep(self._after_error(error, attempt, started, retries))
+                attempt, last_error = attempt + 1, error
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
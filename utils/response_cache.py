@@ -0,0 +1,189 @@
+"""
+Exact cache of LLM answers keyed on the question and its retrieved context.
+
+A key hashes the normalized question, the ids of the retrieved chunks, the
+model list and the prompt-template version, plus the version of the vector
+store the chunks came from. Entries expire after a TTL and the least recently
+used ones are evicted past max_entries. Two backends share one interface:
+
+- MemoryBackend: an in-process LRU dict, per server process;
+- SqliteBackend: a local SQLite file that several worker processes can share.
+
+When the vector store is rebuilt its version changes, and set_store_version()
+drops every answer cached against the old store.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from utils.query_cache import normalize_query
+from utils.single_flight import chunk_id
+
+
+def store_version(manifest: Optional[Dict[str, Any]]) -> str:
+    """Version of a vector store from its manifest: its build fingerprint and shape."""
+    if manifest is None:
+        return ""
+    described = {key: manifest.get(key) for key in ("fingerprint", "count", "dim")}
+    return hashlib.sha256(json.dumps(described, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryBackend:
+    """In-process LRU map of key -> (answer, expiry time)."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._meta: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_meta(self, name: str) -> Optional[str]:
+        return self._meta.get(name)
+
+    def set_meta(self, name: str, value: str):
+        self._meta[name] = value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteBackend:
+    """LRU map in a SQLite file, safe to share between processes on one machine."""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # One connection per backend, used under the lock; WAL lets other processes read while we write
+        self._db = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                         "expires_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) "
+                             "VALUES (?, ?, ?, ?)", (key, value, now + ttl, now))
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                             "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def get_meta(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+CACHE_BACKENDS = {"memory": MemoryBackend, "sqlite": SqliteBackend}
+
+
+class ResponseCache:
+    """TTL + LRU answer cache over a backend, with hit/miss counters."""
+
+    def __init__(self, backend=None, ttl: float = 3600.0):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.store_version = ""
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def set_store_version(self, version: str):
+        """Drop every cached answer if the vector store changed since they were cached."""
+        self.store_version = version
+        if self.backend.get_meta("store_version") != version:
+            if self.backend.get_meta("store_version") is not None:
+                self.invalidations += 1
+            self.backend.clear()
+            self.backend.set_meta("store_version", version)
+
+    def key(self, query: str, context_chunks: Sequence[str], models: List[str], prompt_version: str) -> str:
+        parts = [normalize_query(query), ",".join(chunk_id(chunk) for chunk in context_chunks),
+                 ",".join(models), prompt_version, self.store_version]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        if value:
+            self.backend.set(key, value, self.ttl)
+
+    def record(self, key: str, stream: Iterator[str]) -> Iterator[str]:
+        """Pass stream through, caching the answer once it has been read to the end without errors."""
+        pieces = []
+        for piece in stream:
+            pieces.append(piece)
+            yield piece
+        self.set(key, "".join(pieces))
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.backend), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "invalidations": self.invalidations}
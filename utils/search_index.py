@@ -0,0 +1,98 @@
+"""
+Exact nearest-neighbour search over unit-normalized embeddings.
+
+Embeddings are normalized once when the index is built, so a cosine query is a
+single BLAS matrix product followed by an argpartition top-k selection. The
+kneighbors() signature mirrors sklearn's NearestNeighbors, returning cosine
+distances (1 - similarity) sorted ascending.
+"""
+
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of vectors scaled to unit L2 norm."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the k highest scores per row, returning (indices, scores) sorted descending."""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class SearchIndex:
+    """Common interface for the vector indexes used by TextVectorizer."""
+
+    index_type = "exact"
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False):
+        # Stored unit-norm embeddings (possibly memory-mapped) are used in place, without a copy
+        self.embeddings = embeddings if normalized else normalize_rows(embeddings)
+        self.lexical_index = None  # optional BM25Index over the same chunks, see TextVectorizer.search
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def params(self) -> Dict[str, Any]:
+        """Build parameters that must match for a persisted index to be reused."""
+        return {}
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist alongside the vector store."""
+        return {}
+
+    @classmethod
+    def from_arrays(cls, embeddings: np.ndarray, arrays: Dict[str, np.ndarray], **params) -> "SearchIndex":
+        """Restore a persisted index over normalized embeddings."""
+        return cls(embeddings, normalized=True, **params)
+
+    def kneighbors(self, query_vectors: np.ndarray, n_neighbors: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (distances, indices) of the nearest chunks for each query row."""
+        raise NotImplementedError
+
+    def distances(self, query_vector: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Exact cosine distances from one query to the given chunk ids."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return np.zeros(0, dtype=np.float32)
+        return 1.0 - self.embeddings[ids] @ normalize_rows(query_vector).ravel()
+
+
+class ExactSearchIndex(SearchIndex):
+    """Brute-force cosine search scored with one matrix product per query block."""
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False, query_block: int = 256):
+        super().__init__(embeddings, normalized)
+        self.query_block = query_block
+
+    def kneighbors(self, query_vectors: np.ndarray, n_neighbors: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        k = min(n_neighbors, len(self.embeddings))
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+
+        # Block over queries so the score matrix stays bounded for large batches
+        for start in range(0, len(queries), self.query_block):
+            block = queries[start:start + self.query_block]
+            scores = block @ self.embeddings.T
+            idx, sims = top_k(scores, k)
+            indices[start:start + len(block)] = idx
+            distances[start:start + len(block)] = 1.0 - sims
+
+        return distances, indices
@@ -0,0 +1,209 @@
+"""
+Semantic answer cache for paraphrased questions.
+
+The exact ResponseCache misses "how do I contact you" after "what's your phone
+number". This cache keeps (query embedding, answer, retrieved chunk ids) for
+recent answers in a small in-memory matrix and answers a new question from the
+most similar cached one when their cosine similarity reaches `threshold` and
+both retrieved the same chunks, so an answer is never reused against different
+context. Embeddings come from TextVectorizer.encode_queries, whose query cache
+has usually just encoded the question for retrieval. Entries expire after a TTL
+and the least recently used one is replaced once max_entries is reached.
+
+With log_path set, every lookup is appended to a JSON-lines log. Replaying
+the log offline shows how the hit rate (and, for labelled logs, the share of
+wrong hits) moves with the threshold:
+
+    python -m utils.semantic_cache --log data/semantic_cache_log.jsonl --thresholds 0.8 0.85 0.9 0.95
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from utils.single_flight import chunk_id
+
+
+def context_key(context_chunks: Sequence[str]) -> str:
+    """Order-independent id of a set of retrieved chunks."""
+    return ",".join(sorted(chunk_id(chunk) for chunk in context_chunks))
+
+
+class SemanticCache:
+    """Nearest-neighbour answer cache over normalized query embeddings."""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray] = None, threshold: float = 0.9,
+                 max_entries: int = 1000, ttl: float = 3600.0, log_path: str = None):
+        self.encode = encode
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.log_path = log_path
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), allocated on the first add
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._contexts: List[Optional[str]] = [None] * max_entries
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._count = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.context_mismatches = 0  # similar enough, but retrieved different chunks
+        self.evictions = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.encode([query]), dtype=np.float32).reshape(-1)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, query: str, context_chunks: Sequence[str], vector: np.ndarray = None) -> Optional[str]:
+        """Cached answer for a paraphrase of query that retrieved the same chunks, or None."""
+        vector = self.embed(query) if vector is None else vector
+        context = context_key(context_chunks)
+        with self._lock:
+            self.lookups += 1
+            similarity, row = self._nearest(vector, context)
+            if row is not None:
+                self.hits += 1
+                self._clock += 1
+                self._last_used[row] = self._clock
+            elif similarity >= self.threshold:
+                self.context_mismatches += 1
+            answer = self._answers[row] if row is not None else None
+        if self.log_path:
+            self._log(query, context, similarity, answer is not None)
+        return answer
+
+    def _nearest(self, vector: np.ndarray, context: str):
+        """(best similarity over live entries, row of the best live entry with this context above threshold)."""
+        if not self._count:
+            return -1.0, None
+        similarities = self._vectors[:self._count] @ vector
+        similarities[self._expires[:self._count] <= time.time()] = -np.inf
+        best = float(similarities.max())
+        for row in np.argsort(-similarities):
+            if similarities[row] < self.threshold:
+                break
+            if self._contexts[row] == context:
+                return float(similarities[row]), int(row)
+        return best, None
+
+    def add(self, query: str, context_chunks: Sequence[str], answer: str, vector: np.ndarray = None):
+        if not answer:
+            return
+        vector = self.embed(query) if vector is None else vector
+        context = context_key(context_chunks)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            row = self._slot(vector, context)
+            self._clock += 1
+            self._vectors[row] = vector
+            self._answers[row] = answer
+            self._contexts[row] = context
+            self._expires[row] = time.time() + self.ttl
+            self._last_used[row] = self._clock
+
+    def _slot(self, vector: np.ndarray, context: str) -> int:
+        """Row to write: the same question's entry, a free row, an expired one, or the least recently used."""
+        if self._count:
+            similarities = self._vectors[:self._count] @ vector
+            for row in np.flatnonzero(similarities >= 0.999):
+                if self._contexts[row] == context:
+                    return int(row)
+        if self._count < self.max_entries:
+            self._count += 1
+            return self._count - 1
+        expired = np.flatnonzero(self._expires <= time.time())
+        if len(expired):
+            return int(expired[0])
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def record(self, query: str, context_chunks: Sequence[str], stream: Iterator[str],
+               vector: np.ndarray = None) -> Iterator[str]:
+        """Pass stream through, caching the answer once it has been read to the end without errors."""
+        pieces = []
+        for piece in stream:
+            pieces.append(piece)
+            yield piece
+        self.add(query, context_chunks, "".join(pieces), vector)
+
+    def _log(self, query: str, context: str, similarity: float, hit: bool):
+        line = json.dumps({"time": time.time(), "query": query, "context": context,
+                           "similarity": round(similarity, 4), "hit": hit})
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": self._count, "lookups": self.lookups, "hits": self.hits,
+                    "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                    "context_mismatches": self.context_mismatches, "evictions": self.evictions,
+                    "threshold": self.threshold}
+
+
+def replay(records: List[Dict[str, Any]], vectors: np.ndarray, threshold: float, max_entries: int):
+    """Run logged lookups through a fresh cache; every miss is answered and cached, as in the app.
+
+    Returns (hits, wrong hits, sample hit pairs). A hit is wrong when the log labels the two
+    questions with different "label" values; unlabelled logs count no wrong hits.
+    """
+    cache = SemanticCache(threshold=threshold, max_entries=max_entries, ttl=float("inf"))
+    hits, wrong, pairs = 0, 0, []
+    for i, (record, vector) in enumerate(zip(records, vectors)):
+        context = [record.get("context", "")]
+        cached = cache.lookup(record["query"], context, vector)
+        if cached is None:
+            cache.add(record["query"], context, str(i), vector)
+            continue
+        hits += 1
+        original = records[int(cached)]
+        if "label" in record and "label" in original and record["label"] != original["label"]:
+            wrong += 1
+        pairs.append((original["query"], record["query"]))
+    return hits, wrong, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a semantic cache log to tune the similarity threshold.")
+    parser.add_argument("--log", required=True, help="JSON lines with 'query' and 'context', optionally 'label'")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.92, 0.95])
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--encoder", default="torch", help="encoder backend, as in [retrieval] encoder")
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--show-pairs", type=int, default=5, help="sample hits to print per threshold")
+    args = parser.parse_args()
+
+    with open(args.log, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        sys.exit(f"No queries in {args.log}")
+
+    from utils.encoder_backends import load_encoder
+
+    encoder = load_encoder(args.encoder, args.model)
+    vectors = np.asarray(encoder.encode([record["query"] for record in records]), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    labelled = any("label" in record for record in records)
+    print(f"{len(records)} logged queries{' (labelled)' if labelled else ''}")
+    print(f"{'threshold':>9} {'hits':>6} {'hit rate':>9}" + (f" {'wrong hits':>11}" if labelled else ""))
+    for threshold in sorted(args.thresholds):
+        hits, wrong, pairs = replay(records, vectors, threshold, args.max_entries)
+        print(f"{threshold:>9.3f} {hits:>6} {hits / len(records):>9.1%}" + (f" {wrong:>11}" if labelled else ""))
+        for original, paraphrase in pairs[:args.show_pairs]:
+            print(f"          {original!r} -> {paraphrase!r}")
+
+
+if __name__ == "__main__":
+    main()
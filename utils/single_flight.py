@@ -0,0 +1,163 @@
+"""
+Single-flight coalescing of identical in-flight LLM calls.
+
+Requests are keyed on the normalized question plus the ids of the retrieved
+chunks, so two users asking the same thing against the same context share one
+upstream call. The first caller starts the call; a pump thread reads its stream
+into a buffer that every caller replays from the start and then follows live,
+so late joiners still see the whole answer token by token. The flight is
+forgotten once the answer is complete; caching finished answers is a separate
+concern.
+"""
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterator, List
+
+from utils.query_cache import normalize_query
+
+
+def chunk_id(chunk: str) -> str:
+    """Stable id of a retrieved chunk: a hash of its text."""
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()[:16]
+
+
+def request_key(query: str, context_chunks: List[str]) -> str:
+    return "\x1f".join([normalize_query(query)] + [chunk_id(chunk) for chunk in context_chunks])
+
+
+class FlightAbandonedError(RuntimeError):
+    """Ends a flight whose upstream call was stopped because every caller had left."""
+
+
+class _Flight:
+    def __init__(self):
+        self.pieces: List[str] = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False  # every caller left before the answer finished
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Share one streamed upstream call between all concurrent callers with the same key."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.flights_total = 0
+        self.coalesced_total = 0
+
+    def stream(self, key: str, start: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Pieces of the call for key, calling start() only if no identical call is in flight.
+
+        Errors from start() itself (e.g. the gateway turning the call away) reach every caller.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = True
+            if flight is not None:
+                # Checked and joined under the flight's own lock, so the pump cannot abandon it in between
+                with flight.cond:
+                    if not flight.abandoned:
+                        flight.subscribers += 1
+                        leader = False
+            if leader:
+                flight = self._flights[key] = _Flight()
+                flight.subscribers = 1
+                self.flights_total += 1
+            else:
+                self.coalesced_total += 1
+        if leader:
+            try:
+                upstream = start()
+            except Exception as e:
+                with flight.cond:
+                    flight.subscribers -= 1
+                self._finish(key, flight, e)
+                raise
+            threading.Thread(target=self._pump, args=(key, flight, upstream), name="single-flight",
+                             daemon=True).start()
+        return _Subscription(flight)
+
+    def _finish(self, key: str, flight: _Flight, error: Exception = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.done = True
+            flight.error = error
+            flight.cond.notify_all()
+
+    def _pump(self, key: str, flight: _Flight, upstream: Iterator[str]):
+        error = None
+        try:
+            for piece in upstream:
+                with flight.cond:
+                    flight.pieces.append(piece)
+                    flight.cond.notify_all()
+                    flight.abandoned = abandoned = flight.subscribers == 0
+                if abandoned:
+                    # Every caller stopped reading: stop paying for tokens nobody sees, and end the
+                    # flight with an error so the partial answer is never taken (or cached) as complete
+                    error = FlightAbandonedError("every caller left before the answer finished")
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            close = getattr(upstream, "close", None)
+            if close is not None:
+                close()
+        self._finish(key, flight, error)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._flights)
+        return {"in_flight": in_flight, "flights_total": self.flights_total, "coalesced_total": self.coalesced_total}
+
+
+def _follow(flight: _Flight) -> Iterator[str]:
+    position = 0
+    while True:
+        with flight.cond:
+            while position == len(flight.pieces) and not flight.done:
+                flight.cond.wait()
+            pieces = flight.pieces[position:]
+            done, error = flight.done, flight.error
+        position += len(pieces)
+        yield from pieces
+        if done and position == len(flight.pieces):
+            if error is not None:
+                raise error
+            return
+
+
+class _Subscription:
+    """One caller's view of a flight; it counts as a subscriber until exhausted or closed, even if never read."""
+
+    def __init__(self, flight: _Flight):
+        self._flight = flight
+        self._pieces = _follow(flight)
+        self._closed = False
+
+    def __iter__(self) -> "_Subscription":
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._pieces)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pieces.close()
+        with self._flight.cond:
+            self._flight.subscribers -= 1
+
+    def __del__(self):
+        self.close()
@@ -1,6 +1,7 @@
 """
 Torch utilities for handling watcher issues in Streamlit Cloud.
 This module provides a safe way to import and configure torch to prevent file watcher errors.
+Nothing runs on import; call setup_torch_environment() / suppress_all_warnings() explicitly.
 """
 
 import os
@@ -49,7 +50,3 @@ def suppress_all_warnings():
     warnings.filterwarnings("ignore", category=DeprecationWarning)
     warnings.filterwarnings("ignore", message=".*file_watcher.*")
     warnings.filterwarnings("ignore", message=".*torch.*")
-
-# Initialize on import
-setup_torch_environment()
-suppress_all_warnings()
@@ -0,0 +1,195 @@
+"""
+On-disk vector store layout.
+
+A store is a directory holding:
+    manifest.json   - format version, shapes and build metadata
+    embeddings.npy  - float32 (n_chunks, dim) matrix, opened with mmap_mode='r'
+    chunks.bin      - UTF-8 chunk texts concatenated back to back
+    offsets.npy     - int64 (n_chunks + 1) byte offsets into chunks.bin
+
+Everything is memory-mapped on load, so opening a store is near-instant and
+several processes serving the same store share its pages through the OS cache.
+"""
+
+import os
+import json
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+STORE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.npy"
+
+
+class ChunkStore(Sequence):
+    """Read-only sequence of chunk texts decoded lazily from a memory-mapped blob."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Return the store manifest, or None if there is no compatible store at path."""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != STORE_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]):
+    tmp_file = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, os.path.join(path, MANIFEST_FILE))
+
+
+class StoreWriter:
+    """Incrementally write a store directory, so chunks and vectors can be streamed in without holding them all.
+
+    Embeddings are appended to a raw float32 file and converted to .npy on close();
+    the finished store then replaces any existing store at path atomically.
+    """
+
+    RAW_EMBEDDINGS_FILE = "embeddings.f32"
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path.rstrip(os.sep)
+        self.tmp_path = self.path + ".tmp"
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self.count = 0
+        self.dim = dim  # known up front, an empty store still gets a (0, dim) matrix the indexes can search
+        self._offsets = [0]
+        self._chunks_file = open(os.path.join(self.tmp_path, CHUNKS_FILE), "wb")
+        self._embeddings_file = open(os.path.join(self.tmp_path, self.RAW_EMBEDDINGS_FILE), "wb")
+
+    def append(self, chunks: Sequence[str], embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(chunks):
+            raise ValueError("embeddings must be a (n_chunks, dim) matrix")
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim and len(chunks):
+            raise ValueError(f"embedding width {embeddings.shape[1]} does not match {self.dim}")
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            self._chunks_file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+        self._embeddings_file.write(embeddings.tobytes())
+        self.count += len(chunks)
+
+    def close(self, metadata: Optional[Dict[str, Any]] = None, arrays: Optional[Dict[str, np.ndarray]] = None):
+        """Finish the store and swap it into place."""
+        self._chunks_file.close()
+        self._embeddings_file.close()
+        dim = self.dim or 0
+
+        raw_file = os.path.join(self.tmp_path, self.RAW_EMBEDDINGS_FILE)
+        embeddings_file = os.path.join(self.tmp_path, EMBEDDINGS_FILE)
+        if self.count and dim:
+            raw = np.memmap(raw_file, dtype=np.float32, mode="r", shape=(self.count, dim))
+            out = np.lib.format.open_memmap(embeddings_file, mode="w+", dtype=np.float32, shape=(self.count, dim))
+            for start in range(0, self.count, 65536):
+                out[start:start + 65536] = raw[start:start + 65536]
+            out.flush()
+            del raw, out
+        else:
+            np.save(embeddings_file, np.zeros((self.count, dim), dtype=np.float32))
+        os.remove(raw_file)
+
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), np.array(self._offsets, dtype=np.int64))
+        for name, array in (arrays or {}).items():
+            np.save(os.path.join(self.tmp_path, name + ".npy"), array)
+
+        manifest = dict(metadata or {})
+        manifest.update({
+            "version": STORE_VERSION,
+            "count": self.count,
+            "dim": dim,
+            "dtype": "float32",
+            "arrays": sorted(arrays or {}),
+        })
+        _write_manifest(self.tmp_path, manifest)
+
+        # Swap the new store into place; readers holding maps of the old files keep working
+        old_path = self.path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+def save_store(path: str, chunks: Sequence[str], embeddings: np.ndarray, metadata: Optional[Dict[str, Any]] = None,
+               arrays: Optional[Dict[str, np.ndarray]] = None):
+    """Write a store directory, replacing any existing store at path atomically.
+
+    arrays holds extra named matrices (e.g. a persisted ANN index) saved as <name>.npy.
+    """
+    writer = StoreWriter(path)
+    writer.append(chunks, embeddings)
+    writer.close(metadata, arrays)
+
+
+def load_store(path: str) -> Tuple[ChunkStore, np.ndarray, Dict[str, Any]]:
+    """Memory-map a store directory and return (chunks, embeddings, manifest)."""
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No compatible vector store found at {path}")
+
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+
+    chunks_file = os.path.join(path, CHUNKS_FILE)
+    if os.path.getsize(chunks_file) > 0:
+        blob = np.memmap(chunks_file, dtype=np.uint8, mode="r")
+    else:
+        blob = np.zeros(0, dtype=np.uint8)  # mmap cannot map an empty file
+
+    return ChunkStore(blob, offsets), embeddings, manifest
+
+
+def update_store(path: str, arrays: Dict[str, np.ndarray], metadata: Optional[Dict[str, Any]] = None):
+    """Add or replace extra arrays and manifest fields in an existing store, keeping its chunks and embeddings."""
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No compatible vector store found at {path}")
+    for name, array in arrays.items():
+        tmp_file = os.path.join(path, name + ".tmp.npy")
+        np.save(tmp_file, array)
+        os.replace(tmp_file, os.path.join(path, name + ".npy"))
+    manifest.update(metadata or {})
+    manifest["arrays"] = sorted(set(manifest.get("arrays", [])) | set(arrays))
+    _write_manifest(path, manifest)
+
+
+def load_arrays(path: str, manifest: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Memory-map the extra arrays listed in a store manifest."""
+    return {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in manifest.get("arrays", [])}
@@ -1,10 +1,33 @@
 import os
-from typing import List, Tuple
-import pickle
-from sklearn.neighbors import NearestNeighbors
+import inspect
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
 import numpy as np
 
-# Comprehensive torch watcher prevention
+from utils.ann_index import IVFIndex
+from utils.chunking import TextChunk, iter_chunks
+from utils.dedup import MinHashDeduplicator
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_pipeline import EmbeddingPipeline
+from utils.encoder_backends import ENCODER_BACKENDS, load_encoder
+from utils.lexical_index import BM25Builder, BM25Index
+from utils.quantization import QuantizedSearchIndex
+from utils.query_cache import QueryEmbeddingCache
+from utils.search_index import ExactSearchIndex, SearchIndex, normalize_rows
+from utils.vector_store import StoreWriter, load_arrays, load_store, read_manifest, save_store, update_store
+
+# Search index implementations selectable through TextVectorizer(index_type=...)
+INDEX_TYPES = {
+    ExactSearchIndex.index_type: ExactSearchIndex,
+    IVFIndex.index_type: IVFIndex,
+    QuantizedSearchIndex.index_type: QuantizedSearchIndex,
+}
+
+# 'hybrid' fuses dense and BM25 rankings; 'prefilter' scores only BM25 candidates densely
+RETRIEVAL_MODES = ('dense', 'hybrid', 'prefilter')
+
+# Comprehensive torch watcher prevention; torch itself is only imported when a model is loaded
 os.environ.update({
     "TOKENIZERS_PARALLELISM": "false",
     "TORCH_DISABLE_WATCHDOG": "1",
@@ -12,112 +35,326 @@ os.environ.update({
     "STREAMLIT_WATCHER_IGNORE_MODULES": "torch,torch.classes,torch.jit,torch.nn,torch.utils",
 })
 
-# Import sentence-transformers with torch warning suppression
-import warnings
-warnings.filterwarnings("ignore")
 
-try:
-    from sentence_transformers import SentenceTransformer
-    # Disable torch JIT logging if available
+def vectorizer_options(retrieval_config: Dict[str, Any]) -> Dict[str, Any]:
+    """TextVectorizer keyword arguments from a [retrieval] config section.
+
+    Shared by the app and the command line below, so a store prebuilt from the command line
+    has the fingerprint the app expects and is loaded instead of rebuilt on first start.
+    """
+    return {
+        'index_type': retrieval_config.get('index_type', 'exact'),
+        'index_params': dict(retrieval_config.get('index_params', {})),
+        'query_cache_size': int(retrieval_config.get('query_cache_size', 1024)),
+        'chunking': retrieval_config.get('chunking', 'words'),
+        'embedding_cache_path': retrieval_config.get('embedding_cache_path', os.path.join('data', 'embedding_cache')),
+        # Off unless asked for: TOML has no null to switch a default threshold off
+        'dedup_threshold': (float(retrieval_config.get('dedup_threshold', 0.85))
+                            if retrieval_config.get('dedup', False) else None),
+        'retrieval_mode': retrieval_config.get('mode', 'dense'),
+        'encoder': retrieval_config.get('encoder', 'torch'),
+        'encoder_options': dict(retrieval_config.get('encoder_options', {})),
+    }
+
+
+def read_retrieval_config(secrets_path: str = os.path.join('.streamlit', 'secrets.toml')) -> Dict[str, Any]:
+    """The [retrieval] section of the app's secrets file, or {} when there is none."""
+    import tomllib
+
     try:
-        import torch
-        if hasattr(torch, 'jit') and hasattr(torch.jit, '_set_jit_logging'):
-            torch.jit._set_jit_logging(False)
-    except ImportError:
-        pass
-except ImportError as e:
-    raise ImportError(f"sentence-transformers is required: {e}")
-    os.environ.update({
-        "TOKENIZERS_PARALLELISM": "false",
-        "TORCH_DISABLE_WATCHDOG": "1",
-        "TORCH_JIT_DISABLE_WATCHDOG": "1",
-        "STREAMLIT_WATCHER_IGNORE_MODULES": "torch,torch.classes,torch.jit,torch.nn,torch.utils",
-    })
-    import warnings
-    warnings.filterwarnings("ignore")
-
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError as e:
-    raise ImportError(f"sentence-transformers is required: {e}")
+        with open(secrets_path, 'rb') as f:
+            return dict(tomllib.load(f).get('retrieval', {}))
+    except FileNotFoundError:
+        return {}
+
 
 class TextVectorizer:
-    def __init__(self, model_name: str = 'sentence-transformers/all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'sentence-transformers/all-MiniLM-L6-v2', index_type: str = 'exact',
+                 index_params: Dict[str, Any] = None, query_cache_size: int = 1024,
+                 batch_size: int = 64, num_workers: int = 0, chunking: str = 'words',
+                 embedding_cache_path: str = None, dedup_threshold: float = None,
+                 retrieval_mode: str = 'dense', rrf_k: int = 60, lexical_candidates: int = 50,
+                 encoder: str = 'torch', encoder_options: Dict[str, Any] = None):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {sorted(INDEX_TYPES)}")
+        allowed = set(inspect.signature(INDEX_TYPES[index_type]).parameters) - {'embeddings', 'normalized'}
+        unknown = set(index_params or {}) - allowed
+        if unknown:
+            raise ValueError(f"Unknown index_params {sorted(unknown)} for index type '{index_type}', "
+                             f"expected some of {sorted(allowed)}")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}', expected one of {list(RETRIEVAL_MODES)}")
+        if chunking not in ('words', 'tokens'):
+            raise ValueError(f"Unknown chunking mode '{chunking}', expected 'words' or 'tokens'")
+        if encoder not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend '{encoder}', expected one of {sorted(ENCODER_BACKENDS)}")
         try:
-            self.model = SentenceTransformer(model_name)
+            # Backends import torch / onnxruntime here, so importing this module (and rendering the app) stays cheap
+            self.model = load_encoder(encoder, model_name, encoder_options)
+        except ImportError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to load sentence transformer model: {e}")
-        self.chunk_size = 400  # approximate tokens per chunk
-        self.overlap = 50  # overlap between chunks
+        self.model_name = model_name
+        self.encoder = encoder  # 'torch', 'torch-int8' or 'onnx', see utils.encoder_backends
+        self.chunking = chunking
+        if chunking == 'tokens':
+            # Size chunks in the encoder's own tokens so nothing past max_seq_length is silently truncated
+            if not getattr(self.model.tokenizer, 'is_fast', False):
+                raise ValueError("Token chunking needs a fast tokenizer with offset mapping")
+            self.chunk_size = self.model.max_seq_length - self.model.tokenizer.num_special_tokens_to_add()
+            # Overlap between chunks, in tokens; scaled down for encoders with short windows
+            self.overlap = min(32, self.chunk_size // 4)
+        else:
+            self.chunk_size = 400  # words per chunk, may exceed the encoder's max_seq_length
+            self.overlap = 50  # overlap between chunks
+        self.dedup_threshold = dedup_threshold  # MinHash Jaccard threshold, None disables deduplication
+        self.last_dedup_report = None
+        self.index_type = index_type
+        # e.g. {'nlist': 1024, 'nprobe': 16} for 'ivf', {'quantization': 'int8', 'rescore': 10} for 'quantized'
+        self.index_params = dict(index_params or {})
+        self.retrieval_mode = retrieval_mode
+        self.rrf_k = rrf_k  # reciprocal rank fusion damping constant
+        self.lexical_candidates = lexical_candidates  # candidates taken from each ranking before fusing or rescoring
+        self.query_cache = QueryEmbeddingCache(query_cache_size)
+        # Content-addressed cache so rebuilding the store only encodes new or changed chunks
+        # Quantized backends produce slightly different vectors, so they get their own cache entries
+        cache_model_name = model_name if encoder == 'torch' else f"{model_name}:{encoder}"
+        embedding_cache = EmbeddingCache(embedding_cache_path, cache_model_name) if embedding_cache_path else None
+        self.embedding_pipeline = EmbeddingPipeline(self.model, model_name, batch_size=batch_size, num_workers=num_workers,
+                                                    cache=embedding_cache, backend=encoder,
+                                                    backend_options=encoder_options)
 
     def get_text_chunks(self, text: str) -> List[str]:
         """Split text into overlapping chunks."""
-        words = text.split()
-        chunks = []
-        
-        i = 0
-        while i < len(words):
-            chunk = ' '.join(words[i:i + self.chunk_size])
-            chunks.append(chunk)
-            i += (self.chunk_size - self.overlap)
-            
-        return chunks
-
-    def create_vector_store(self, chunks: List[str]) -> Tuple[NearestNeighbors, np.ndarray]:
-        """Create sklearn NearestNeighbors vector store from text chunks."""
-        # Create embeddings
-        embeddings = self.model.encode(chunks)
-        embeddings = np.array(embeddings).astype('float32')
+        return [chunk.text for chunk in self.iter_text_chunks([text])]
+
+    def iter_text_chunks(self, source: Union[str, Iterable]) -> Iterator[TextChunk]:
+        """Stream chunks with source offsets from a file path or an iterable of documents."""
+        tokenizer = self.model.tokenizer if self.chunking == 'tokens' else None
+        return iter_chunks(source, self.chunk_size, self.overlap, tokenizer=tokenizer)
+
+    def embed_chunks(self, chunks: Sequence[str], mmap_path: str = None) -> np.ndarray:
+        """Encode chunks into unit-norm float32 rows through the batched embedding pipeline."""
+        return self.embedding_pipeline.encode(chunks, mmap_path=mmap_path)
+
+    def create_vector_store(self, chunks: List[str], mmap_path: str = None) -> Tuple[SearchIndex, np.ndarray]:
+        """Create a vector store from text chunks."""
+        # Create embeddings, normalized once here so cosine search is a plain dot product
+        embeddings = self.embed_chunks(chunks, mmap_path=mmap_path)
         
-        # Initialize NearestNeighbors index
-        index = NearestNeighbors(n_neighbors=min(3, len(chunks)), metric='cosine', algorithm='auto')
-        index.fit(embeddings)
+        # Initialize search index
+        index = self.build_index(embeddings, normalized=True)
         
         return index, embeddings
 
-    def save_vector_store(self, file_path: str, index: NearestNeighbors, chunks: List[str], embeddings: np.ndarray):
-        """Save the vector store to disk."""
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'wb') as f:
-            pickle.dump({
-                'index': index,
-                'chunks': chunks,
-                'embeddings': embeddings
-            }, f)
-
-    def load_vector_store(self, file_path: str) -> Tuple[NearestNeighbors, List[str], np.ndarray]:
-        """Load the vector store from disk."""
-        with open(file_path, 'rb') as f:
-            data = pickle.load(f)
-        return data['index'], data['chunks'], data['embeddings']
-
-    def search(self, query: str, index: NearestNeighbors, chunks: List[str], k: int = 3) -> List[Tuple[str, float]]:
+    def store_fingerprint(self, source_path: str) -> Dict[str, Any]:
+        """Describe everything a persisted vector store depends on."""
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return {'source_sha256': digest.hexdigest(), **self.settings_fingerprint()}
+
+    def settings_fingerprint(self) -> Dict[str, Any]:
+        """The part of the store fingerprint that depends on this vectorizer's settings, not on the text."""
+        return {
+            'chunking': self.chunking,
+            'dedup_threshold': self.dedup_threshold,
+            'chunk_size': self.chunk_size,
+            'overlap': self.overlap,
+            'model_name': self.model_name,
+            'encoder': self.encoder,
+        }
+
+    def build_index(self, embeddings: np.ndarray, normalized: bool = False) -> SearchIndex:
+        """Build a search index over existing embeddings."""
+        return INDEX_TYPES[self.index_type](embeddings, normalized=normalized, **self.index_params)
+
+    def build_vector_store(self, source: Union[str, Iterable], store_path: str, fingerprint: Dict[str, Any] = None) -> int:
+        """Stream chunks from source through the embedding pipeline into a store, without holding the corpus.
+
+        The search index is built from the stored embeddings on the next load_vector_store().
+        Returns the number of chunks written.
+        """
+        writer = StoreWriter(store_path, dim=self.model.get_sentence_embedding_dimension())
+        spans = array('q')
+        lexical = BM25Builder()
+        chunks = self.iter_text_chunks(source)
+        deduplicator = None
+        if self.dedup_threshold is not None:
+            # Drop near-duplicate boilerplate chunks before they cost encode time and index slots
+            deduplicator = MinHashDeduplicator(threshold=self.dedup_threshold)
+            chunks = deduplicator.filter(chunks)
+        for chunks, embeddings in self.embedding_pipeline.encode_stream(chunks):
+            writer.append([chunk.text for chunk in chunks], embeddings)
+            for chunk in chunks:
+                spans.extend((chunk.start, chunk.end))
+                lexical.add(chunk.text)
+        lexical_index = lexical.build()
+        self.last_dedup_report = deduplicator.report if deduplicator else None
+        writer.close({
+            'model_name': self.model_name,
+            'fingerprint': fingerprint,
+            'normalized': True,
+            'dedup': deduplicator.report.as_dict() if deduplicator else None,
+            'lexical_params': lexical_index.params()
+        }, arrays={'chunk_spans': np.frombuffer(spans, dtype=np.int64).reshape(-1, 2), **lexical_index.to_arrays()})
+        return writer.count
+
+    def save_vector_store(self, file_path: str, index: SearchIndex, chunks: Sequence[str], embeddings: np.ndarray,
+                          fingerprint: Dict[str, Any] = None, metadata: Dict[str, Any] = None):
+        """Save the vector store to disk; metadata adds extra manifest fields."""
+        # Only the index's own structures are persisted; it always searches the store's embedding matrix
+        lexical_index = index.lexical_index or BM25Index.from_chunks(chunks)
+        save_store(file_path, chunks, normalize_rows(embeddings), {
+            'model_name': self.model_name,
+            'fingerprint': fingerprint,
+            'normalized': True,
+            'index_type': index.index_type,
+            'index_params': index.params(),
+            'lexical_params': lexical_index.params(),
+            **(metadata or {})
+        }, arrays={**index.to_arrays(), **lexical_index.to_arrays()})
+
+    def load_vector_store(self, file_path: str) -> Tuple[SearchIndex, Sequence[str], np.ndarray]:
+        """Load the vector store from disk, memory-mapping chunks and embeddings."""
+        chunks, embeddings, manifest = load_store(file_path)
+        arrays = load_arrays(file_path, manifest)
+        stored_params = manifest.get('index_params', {})
+        reusable = (manifest.get('normalized', False)
+                    and manifest.get('index_type') == self.index_type
+                    and all(self.index_params.get(key, value) == value for key, value in stored_params.items()))
+        if reusable:
+            index = INDEX_TYPES[self.index_type].from_arrays(embeddings, arrays, **self.index_params)
+        else:
+            # Configured index differs from the persisted one: build it and persist it for the next start
+            index = self.build_index(embeddings, normalized=manifest.get('normalized', False))
+            if manifest.get('normalized', False):
+                update_store(file_path, index.to_arrays(), {
+                    'index_type': index.index_type,
+                    'index_params': index.params()
+                })
+        if 'bm25_postings' in arrays:
+            index.lexical_index = BM25Index.from_arrays(arrays, **manifest.get('lexical_params', {}))
+        elif self.retrieval_mode != 'dense':
+            # Stores written before the lexical index existed get one on first hybrid load
+            index.lexical_index = BM25Index.from_chunks(chunks)
+            update_store(file_path, index.lexical_index.to_arrays(), {'lexical_params': index.lexical_index.params()})
+        return index, chunks, embeddings
+
+    def load_or_build_vector_store(self, source_path: str, store_path: str) -> Tuple[SearchIndex, Sequence[str], np.ndarray]:
+        """Load the persisted vector store, rebuilding it only if its inputs changed.
+
+        A store edited document by document (see utils.document_index) is its own source of truth:
+        it is loaded as long as it was built with these settings, and source_path is ignored.
+        """
+        manifest = read_manifest(store_path)
+        if manifest is not None and manifest.get('documents') is not None:
+            stored = {key: value for key, value in (manifest.get('fingerprint') or {}).items() if key != 'source_sha256'}
+            if stored != self.settings_fingerprint():
+                # Rebuilding from source_path would silently drop the document edits
+                raise ValueError(f"The document-managed store at {store_path} was built with different retrieval "
+                                 f"settings ({stored}); re-add its documents with utils.document_index or delete it")
+            return self.load_vector_store(store_path)
+
+        fingerprint = self.store_fingerprint(source_path)
+        if manifest is not None and manifest.get('fingerprint') == fingerprint:
+            return self.load_vector_store(store_path)
+
+        # Stream the source straight into the store, then load it (building the index) like a prebuilt one
+        self.build_vector_store(source_path, store_path, fingerprint)
+        return self.load_vector_store(store_path)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode queries, skipping the encoder for any recently seen query."""
+        vectors = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing])
+            encoded = np.array(encoded).astype('float32').reshape(len(missing), -1)
+            for i, vector in zip(missing, encoded):
+                self.query_cache.put(queries[i], vector)
+                vectors[i] = vector
+        return np.vstack(vectors)
+
+    def search(self, query: str, index: SearchIndex, chunks: Sequence[str], k: int = 3) -> List[Tuple[str, float]]:
         """Search for relevant chunks given a query."""
-        query_vector = self.model.encode([query])
-        query_vector = np.array(query_vector).astype('float32').reshape(1, -1)
+        return self.search_batch([query], index, chunks, k)[0]
+
+    def search_batch(self, queries: List[str], index: SearchIndex, chunks: Sequence[str], k: int = 3) -> List[List[Tuple[str, float]]]:
+        """Search for several queries at once with one encoder pass and one scoring product."""
+        if not queries:
+            return []
+        query_vectors = self.encode_queries(queries)
         
         k = min(k, len(chunks))  # Ensure k doesn't exceed number of chunks
-        distances, indices = index.kneighbors(query_vector, n_neighbors=k)
+        if self.retrieval_mode == 'dense' or index.lexical_index is None:
+            distances, indices = index.kneighbors(query_vectors, n_neighbors=k)
+        elif self.retrieval_mode == 'hybrid':
+            distances, indices = self._hybrid_search(queries, query_vectors, index, k)
+        else:
+            distances, indices = self._prefilter_search(queries, query_vectors, index, k)
         
         results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            results.append((chunks[idx], float(distance)))
+        for row_indices, row_distances in zip(indices, distances):
+            results.append([(chunks[idx], float(distance)) for idx, distance in zip(row_indices, row_distances)])
         
         return results
 
+    def _hybrid_search(self, queries: List[str], query_vectors: np.ndarray, index: SearchIndex,
+                       k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Reciprocal rank fusion of the dense and BM25 rankings; distances stay dense cosine distances."""
+        n_candidates = min(max(k, self.lexical_candidates), len(index.lexical_index))
+        _, dense_indices = index.kneighbors(query_vectors, n_neighbors=n_candidates)
+        distances, indices = [], []
+        for query, query_vector, dense_ids in zip(queries, query_vectors, dense_indices):
+            lexical_ids, _ = index.lexical_index.search(query, n_candidates)
+            fused = {}
+            for ranking in (dense_ids, lexical_ids):
+                for rank, idx in enumerate(ranking):
+                    fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            best = np.array(sorted(fused, key=fused.get, reverse=True)[:k], dtype=np.int64)
+            indices.append(best)
+            distances.append(index.distances(query_vector, best))
+        return distances, indices
+
+    def _prefilter_search(self, queries: List[str], query_vectors: np.ndarray, index: SearchIndex,
+                          k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Score only BM25 candidates densely; dense results fill in when fewer than k chunks match lexically."""
+        distances, indices = [], []
+        for query, query_vector in zip(queries, query_vectors):
+            candidates, _ = index.lexical_index.search(query, max(k, self.lexical_candidates))
+            candidate_distances = index.distances(query_vector, candidates)
+            order = np.argsort(candidate_distances, kind='stable')[:k]
+            row_distances, row_indices = candidate_distances[order], candidates[order]
+            if len(row_indices) < k:
+                dense_distances, dense_indices = index.kneighbors(query_vector[np.newaxis, :], n_neighbors=k)
+                extra = ~np.isin(dense_indices[0], row_indices)
+                row_distances = np.concatenate([row_distances, dense_distances[0][extra]])[:k]
+                row_indices = np.concatenate([row_indices, dense_indices[0][extra]])[:k]
+            distances.append(row_distances)
+            indices.append(row_indices)
+        return distances, indices
+
+
 if __name__ == "__main__":
     INPUT_FILE = os.path.join("data", "website_data.txt")
-    OUTPUT_FILE = os.path.join("data", "vector_store.pkl")
+    OUTPUT_FILE = os.path.join("data", "vector_store")
     
-    vectorizer = TextVectorizer()
-    
-    # Read input text
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        text = f.read()
+    # Same [retrieval] settings as the app, so the app loads this store instead of rebuilding it
+    vectorizer = TextVectorizer(num_workers=int(os.environ.get("EMBED_WORKERS", "0")),
+                                **vectorizer_options(read_retrieval_config()))
+
+    vectorizer.embedding_pipeline.progress_callback = lambda done, total: print(f"Embedded {done} chunks", end="\r")
     
-    # Create chunks and vector store
-    chunks = vectorizer.get_text_chunks(text)
-    index, embeddings = vectorizer.create_vector_store(chunks)
-    vectorizer.save_vector_store(OUTPUT_FILE, index, chunks, embeddings)
+    # Stream chunks from the input file into the embedding step and the store
+    fingerprint = vectorizer.store_fingerprint(INPUT_FILE)
+    vectorizer.build_vector_store(INPUT_FILE, OUTPUT_FILE, fingerprint)
+    index, chunks, embeddings = vectorizer.load_vector_store(OUTPUT_FILE)
     
+    print(f"\nEmbedding throughput: {vectorizer.embedding_pipeline.last_throughput:.1f} chunks/s")
+    if vectorizer.last_dedup_report:
+        print(vectorizer.last_dedup_report)
+
     print(f"Vector store created and saved to {OUTPUT_FILE}")